@@ -13,6 +13,9 @@ from email.mime.base import MIMEBase
 from email import encoders
 import time
 from dotenv import load_dotenv
+import argparse
+
+from crm_run_ledger import RUN_LEDGER_NAME, config_hash, file_sha256, find_run, record_run
 
 # ============================================================================
 # STEP 1: CONFIGURATION AND INITIALIZATION
@@ -44,6 +47,8 @@ def initialize_config():
         ]
 
     }
+    # Workbook hashes, images and send status of each run (see crm_run_ledger)
+    config['run_ledger'] = os.path.join(config['base_dir'], RUN_LEDGER_NAME)
     return config
 
 # ============================================================================
@@ -1269,8 +1274,8 @@ def send_html_email_with_images(html_content, image_paths, config, excel_file_pa
 # STEP 9: MAIN EXECUTION FUNCTION
 # ============================================================================
 
-def main():
-    """Main execution function for LBF"""
+def main(force=False):
+    """Main execution function for LBF; force reruns every step for a workbook already emailed"""
     print("=" * 60)
     print("LBF CRM Email Automation System")
     print("=" * 60)
@@ -1287,8 +1292,21 @@ def main():
     
     print(f"✓ Found latest LBF file: {excel_file}")
     
+    # A workbook already emailed is skipped; after a failed send only the email is redone
+    job = os.path.splitext(os.path.basename(__file__))[0]
+    input_hash = file_sha256(excel_file)
+    settings_hash = config_hash(config)
+    previous = None if force else find_run(config['run_ledger'], job, input_hash, settings_hash)
+    if previous and previous['status'] == 'sent':
+        print(f"✅ Already done: this LBF workbook was emailed at {previous['finished']} (use --force to run again)")
+        return
+    if previous:
+        print(f"✓ Unchanged LBF workbook since {previous['finished']}, resending its email only")
+    
     print("\n[STEP 3] Recalculating Excel formulas with Add-in...")
-    if not recalculate_excel_with_addin(excel_file, config['addin_path']):
+    if previous:
+        print("✓ Skipped, already recalculated by the previous run")
+    elif not recalculate_excel_with_addin(excel_file, config['addin_path']):
         print("⚠ Warning: Excel recalculation had issues, but continuing...")
     
     print("\n[STEP 4] Extracting data from Excel...")
@@ -1301,7 +1319,7 @@ def main():
     print(f"✓ Data extracted successfully: {len(crm_email_data)} rows")
     
     print("\n[STEP 5] Creating LBF table images/screenshots...")
-    image_paths = create_screenshots(excel_file)
+    image_paths = previous['artifacts'] if previous else create_screenshots(excel_file)
     
     if not image_paths:
         print("❌ Error: Failed to create LBF screenshots. Exiting.")
@@ -1319,6 +1337,8 @@ def main():
     
     print("\n[STEP 7] Sending LBF HTML email with embedded images...")
     success = send_html_email_with_images(html_content, image_paths, config, excel_file)
+    record_run(config['run_ledger'], job, excel_file, input_hash, settings_hash, image_paths, success,
+               resent=previous is not None)
 
     if success:
         print("\n" + "=" * 60)
@@ -1340,8 +1360,11 @@ def main():
 # ============================================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and send the LBF CRM email")
+    parser.add_argument('--force', action='store_true', help="run every step even if this workbook was already emailed")
+    args = parser.parse_args()
     try:
-        main()
+        main(force=args.force)
     except KeyboardInterrupt:
         print("\n\n⚠ LBF process interrupted by user.")
     except Exception as e:
@@ -0,0 +1,92 @@
+"""
+CRM Email Run Ledger
+Shared by the crm_*_email.py scripts so a rerun on the same workbook does not
+redo the work:
+1. Each run appends one JSON line to <base_dir>/crm_run_ledger.jsonl with the
+   SHA-256 of the workbook as found and as saved after the recalculation, a
+   hash of the settings, the table images it made and whether the email went
+2. A rerun on an unchanged workbook is "already done" once its email went;
+   after a failed send, the images are reused and only the email is resent
+3. --force (or force=True) always runs every step again
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# ============================================================================
+# STEP 1: LEDGER SETTINGS
+# ============================================================================
+
+RUN_LEDGER_NAME = 'crm_run_ledger.jsonl'
+
+# Credentials and run switches are left out of the settings hash
+RUN_ONLY_KEYS = ['sender_email', 'sender_password', 'run_ledger']
+
+# ============================================================================
+# STEP 2: FINGERPRINTS
+# ============================================================================
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_hash(config, ignored=RUN_ONLY_KEYS):
+    """SHA-256 of the settings that shape the email"""
+    settings = {key: value for key, value in config.items() if key not in ignored}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+# ============================================================================
+# STEP 3: LOOKUP AND RECORDING
+# ============================================================================
+
+def read_ledger(ledger_path):
+    """Every record of the ledger, oldest first; unreadable lines are skipped"""
+    if not ledger_path or not os.path.exists(ledger_path):
+        return []
+
+    records = []
+    with open(ledger_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def find_run(ledger_path, job, input_hash, settings_hash):
+    """
+    The latest run of job on this workbook (as found or as it saved it) with
+    the same settings whose images all still exist, or None
+    """
+    for record in reversed(read_ledger(ledger_path)):
+        if (record.get('job') == job and record.get('config_hash') == settings_hash
+                and input_hash in (record.get('input_hash'), record.get('saved_input_hash'))):
+            images = record.get('artifacts', {}).values()
+            return record if all(os.path.exists(path) for path in images) else None
+    return None
+
+
+def record_run(ledger_path, job, excel_file, input_hash, settings_hash, artifacts, sent, resent=False):
+    """Append one run to the ledger; the workbook is hashed again as the run left it"""
+    record = {
+        'job': job,
+        'finished': datetime.now().isoformat(timespec='seconds'),
+        'excel_file': os.path.basename(excel_file),
+        'input_hash': input_hash,
+        'saved_input_hash': file_sha256(excel_file),
+        'config_hash': settings_hash,
+        'artifacts': artifacts,
+        'status': 'sent' if sent else 'built',
+        'resent': resent,
+    }
+    with open(ledger_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+    return record
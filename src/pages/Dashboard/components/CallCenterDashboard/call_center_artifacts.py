@@ -0,0 +1,126 @@
+"""
+Call Center Dashboard Artifacts
+Small pre-aggregated files the dashboard reads instead of the full workbook:
+1. One compact JSON per product and date (and one for all products) with the
+   KPI cards, communication type, call notes and status counts, the agent
+   performance and direction summary tables, and the intraday call profile
+2. Tables are stored column-wise ({'columns', 'rows'}) under the workbook's
+   sheet and column names, so the dashboard hook expands them to the same
+   records it would parse from the FINAL_CDR_CALL_REPORT workbook
+3. 'schema_version' tells the hook which layout it got; it falls back to the
+   workbook for a version it does not know
+A day's artifact is a few kilobytes, where the workbook's All_Call_Data sheet
+alone runs to megabytes. JSON is used rather than Parquet so the browser needs
+no extra decoder.
+"""
+
+import json
+
+from call_center_intraday import INTRADAY_SLOT_MINUTES, profile_matrix
+from call_center_kpis import direction_frame, notes_frame
+from call_center_metrics import format_rates
+
+# ============================================================================
+# STEP 1: ARTIFACT SETTINGS
+# ============================================================================
+
+# Bump when the layout changes; useCallCenterData.js lists the versions it reads
+ARTIFACT_SCHEMA_VERSION = 1
+
+# File name prefix, matched by the dashboard hook like FINAL_CDR_CALL_REPORT
+ARTIFACT_PREFIX = 'CALL_CENTER_DASHBOARD'
+
+# Intraday matrix fields kept in the artifact (the full-resolution cells stay
+# in the call_center_intraday JSON)
+INTRADAY_FIELDS = ['slot_minutes', 'slots', 'total_calls', 'slot_calls', 'direction_calls', 'outcome_calls']
+
+
+def artifact_name(report_date, product=None):
+    """File name of the artifact of all products (product None) or one product"""
+    return '_'.join(part for part in [ARTIFACT_PREFIX, product, report_date] if part) + '.json'
+
+# ============================================================================
+# STEP 2: ARTIFACT CONTENT
+# ============================================================================
+
+def table_json(df):
+    """A DataFrame as {'columns', 'rows'} with plain JSON values (missing values become None)"""
+    frame = df.astype(object)
+    frame = frame.where(frame.notna(), None)
+    return {'columns': [str(column) for column in frame.columns], 'rows': frame.to_numpy().tolist()}
+
+
+def count_json(counts):
+    """A counts Series as {label: count}"""
+    return {str(label): int(count) for label, count in counts.items()}
+
+
+def dashboard_tables(metrics, agents_df, excluded_agents=()):
+    """The workbook summary sheets of a metrics bundle, as column-wise tables"""
+    tables = {'Agent_Performance': table_json(format_rates(agents_df))}
+    for sheet, agent_column, direction, total in [('Outbound_Summary', 'Call From', 'Outbound', 'outbound_total'),
+                                                  ('Inbound_Summary', 'Call To', 'Inbound', 'inbound_total')]:
+        if metrics[total] > 0:
+            frame = direction_frame(metrics, agent_column, direction, excluded_agents)
+            tables[sheet] = table_json(format_rates(frame).reset_index())
+    tables['Call_Notes_Summary'] = table_json(notes_frame(metrics))
+    return tables
+
+
+def intraday_json(profile, agent_names, slot_minutes=INTRADAY_SLOT_MINUTES):
+    """
+    The slot totals of a profile, with per-agent slot rows for agent_names
+    only (the profile also holds the numbers of calls no agent handled)
+    """
+    matrix = profile_matrix(profile, slot_minutes)
+    agent_names = set(agent_names)
+    agent_rows = [(agent, calls) for agent, calls in zip(matrix['agents'], matrix['agent_calls'])
+                  if agent in agent_names]
+    return {
+        **{field: matrix[field] for field in INTRADAY_FIELDS},
+        'agents': [agent for agent, _ in agent_rows],
+        'agent_calls': [calls for _, calls in agent_rows],
+    }
+
+
+def dashboard_artifact(metrics, agents_df, report_date, excluded_agents=(), profile=None,
+                       slot_minutes=INTRADAY_SLOT_MINUTES):
+    """
+    The artifact of one scope: a metrics bundle, its agents and, when the
+    intraday profile is on, the scope's profile rows
+    """
+    communication_counts = count_json(metrics['communication_counts'])
+    intraday = None
+    if profile is not None:
+        intraday = intraday_json(profile, agents_df['Agent Name'], slot_minutes)
+
+    return {
+        'schema_version': ARTIFACT_SCHEMA_VERSION,
+        'report_date': report_date,
+        'scope': metrics['scope'],
+        'metrics': {
+            'total_calls': metrics['total_calls'],
+            'inbound_calls': communication_counts.get('Inbound', 0),
+            'outbound_calls': communication_counts.get('Outbound', 0),
+            'internal_calls': communication_counts.get('Internal', 0),
+            'successful_calls': metrics['successful_calls'],
+            'unsuccessful_calls': metrics['unsuccessful_calls'],
+            'distinct_called_numbers': int(metrics['distinct_called_numbers']),
+            'distinct_calling_numbers': int(metrics['distinct_calling_numbers']),
+            'active_agents': int(metrics['total_agents']),
+        },
+        'communication_counts': communication_counts,
+        'note_counts': count_json(metrics['note_counts']),
+        'status_counts': count_json(metrics['status_counts']),
+        'tables': dashboard_tables(metrics, agents_df, excluded_agents),
+        'intraday': intraday,
+    }
+
+
+def write_dashboard_artifact(path, metrics, agents_df, report_date, excluded_agents=(), profile=None,
+                             slot_minutes=INTRADAY_SLOT_MINUTES):
+    """Write the compact JSON artifact of one scope"""
+    artifact = dashboard_artifact(metrics, agents_df, report_date, excluded_agents, profile, slot_minutes)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, separators=(',', ':'))
+    return path
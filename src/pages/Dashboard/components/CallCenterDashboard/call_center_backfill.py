@@ -0,0 +1,196 @@
+"""
+Call Center Report Backfill
+Regenerates the daily call center reports for many days at once:
+1. Finds every pse-cdr export in a folder and the (first) day each one covers;
+   exports spanning several days are split per day by the pipeline
+2. Keeps the days inside an optional --start/--end date range
+3. Runs the report pipeline for each day in parallel worker processes
+4. Writes each day to NEW_FILES/<product>/<date> and its log to NEW_FILES/backfill_logs
+5. Prints progress as days finish and saves a summary CSV at the end
+Emails are only sent with --notify. Days the run ledger already has (same
+CDR export and settings) are not rebuilt unless --force is given.
+
+Usage: python call_center_backfill.py [--folder DIR] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+                                      [--workers N] [--notify] [--force]
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+from call_center_loader import parse_cdr_time
+from call_center_products import load_product_mapping
+from call_center_report_copy import find_input_files, initialize_config, run_pipeline
+from call_center_stages import extract_report_date
+
+# ============================================================================
+# STEP 1: BACKFILL SETTINGS
+# ============================================================================
+
+# Worker processes for days; None means one per CPU core
+BACKFILL_WORKERS = None
+
+BACKFILL_LOG_DIR = 'backfill_logs'
+
+SUMMARY_COLUMNS = ['report_date', 'days', 'status', 'rows', 'seconds', 'cdr_file', 'log_file', 'error']
+
+# ============================================================================
+# STEP 2: FINDING THE DAYS
+# ============================================================================
+
+def cdr_report_date(cdr_file):
+    """Return the report date of a CDR export, read from its first row only"""
+    first_row = pd.read_csv(cdr_file, usecols=['Time'], nrows=1)
+    return extract_report_date(parse_cdr_time(first_row['Time']))
+
+
+def find_backfill_days(folder_path, start=None, end=None):
+    """
+    Return {report_date: cdr_file} for the pse-cdr exports in folder_path,
+    limited to start..end (inclusive, 'YYYY-MM-DD') when given.
+    When two files cover the same day the most recently modified one is used.
+    """
+    cdr_files = [os.path.join(folder_path, name) for name in os.listdir(folder_path)
+                 if name.lower().startswith('pse-cdr') and name.lower().endswith('.csv')]
+
+    days = {}
+    for cdr_file in sorted(cdr_files, key=os.path.getmtime):
+        report_date = cdr_report_date(cdr_file)
+        if (start and report_date < start) or (end and report_date > end):
+            continue
+        if report_date in days:
+            print(f"⚠️ {os.path.basename(days[report_date])} and {os.path.basename(cdr_file)} "
+                  f"both cover {report_date}, using the newer file")
+        days[report_date] = cdr_file
+
+    return dict(sorted(days.items()))
+
+# ============================================================================
+# STEP 3: ONE DAY
+# ============================================================================
+
+def backfill_day(config, notify=False):
+    """
+    Run the report pipeline for one CDR file, logging its output to a file.
+    Never raises; failures are returned in the summary row instead.
+    """
+    log_dir = os.path.join(config['export_root'], BACKFILL_LOG_DIR)
+    os.makedirs(log_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(config['cdr_file']))[0]
+    log_file = os.path.join(log_dir, f"{stem}.log")
+
+    summary = {'cdr_file': config['cdr_file'], 'log_file': log_file, 'report_date': None, 'days': 0,
+               'status': 'ok', 'rows': 0, 'seconds': 0.0, 'error': ''}
+    start = time.perf_counter()
+
+    with open(log_file, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            result = run_pipeline(config, notify=notify)
+            summary['report_date'] = min(result['days'])
+            summary['days'] = len(result['days'])
+            summary['rows'] = result['rows']
+        except Exception as e:
+            import traceback
+            traceback.print_exc(file=log)
+            summary['status'] = 'failed'
+            summary['error'] = str(e)
+
+    summary['seconds'] = round(time.perf_counter() - start, 1)
+    return summary
+
+# ============================================================================
+# STEP 4: ALL DAYS IN PARALLEL
+# ============================================================================
+
+def run_backfill(config, start=None, end=None, workers=BACKFILL_WORKERS, notify=False):
+    """
+    Regenerate the reports of every day found in config['folder_path'].
+    Returns the summary DataFrame, one row per day.
+    """
+    days = find_backfill_days(config['folder_path'], start, end)
+    if not days:
+        print(f"⚠️ No pse-cdr files found in {config['folder_path']} for the requested dates")
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    # Every day shares the master workbook; warm its cache once up front
+    _, master_cdr_file = find_input_files(config['folder_path'])
+    master_cdr_file = config['master_cdr_file'] or master_cdr_file
+    if master_cdr_file and os.path.exists(master_cdr_file):
+        load_product_mapping(master_cdr_file)
+
+    # Days are the unit of parallelism, so each day renders its charts and
+    # writes its workbooks serially
+    day_configs = [{**config, 'cdr_file': cdr_file, 'master_cdr_file': master_cdr_file,
+                    'chart_workers': 1, 'excel_workers': 1}
+                   for cdr_file in days.values()]
+
+    workers = min(workers or os.cpu_count() or 1, len(day_configs))
+    print(f"🚀 Backfilling {len(day_configs)} days ({min(days)} to {max(days)}) with {workers} workers")
+
+    summaries = []
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(backfill_day, day_config, notify) for day_config in day_configs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            summary = future.result()
+            summaries.append(summary)
+            if summary['status'] == 'ok':
+                extra_days = f" (+{summary['days'] - 1} more days)" if summary['days'] > 1 else ""
+                print(f"✓ [{done}/{len(futures)}] {summary['report_date']}{extra_days}: "
+                      f"{summary['rows']:,} calls in {summary['seconds']}s")
+            else:
+                print(f"❌ [{done}/{len(futures)}] {os.path.basename(summary['cdr_file'])} failed: "
+                      f"{summary['error']} (see {summary['log_file']})")
+
+    summary_df = pd.DataFrame(summaries, columns=SUMMARY_COLUMNS).sort_values('report_date', na_position='last')
+    print_backfill_summary(summary_df, time.perf_counter() - start_time)
+
+    summary_path = os.path.join(config['export_root'], BACKFILL_LOG_DIR,
+                                f"backfill_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    summary_df.to_csv(summary_path, index=False)
+    print(f"💾 Backfill summary saved: {summary_path}")
+    return summary_df
+
+
+def print_backfill_summary(summary_df, seconds):
+    """Print the end-of-run totals and any failed days"""
+    failed = summary_df[summary_df['status'] != 'ok']
+
+    print("\n" + "=" * 60)
+    print(f"📋 BACKFILL SUMMARY: {len(summary_df) - len(failed)} of {len(summary_df)} days succeeded "
+          f"in {seconds:.1f}s")
+    print(f"   Calls processed: {summary_df['rows'].sum():,}")
+    for _, row in failed.iterrows():
+        print(f"   ❌ {os.path.basename(row['cdr_file'])}: {row['error']}")
+    print("=" * 60)
+
+# ============================================================================
+# STEP 5: ENTRY POINT
+# ============================================================================
+
+def main():
+    """Parse the command line and run the backfill"""
+    parser = argparse.ArgumentParser(description="Regenerate call center reports for many days")
+    parser.add_argument('--folder', help="folder with the pse-cdr exports (default: ROW_FILES)")
+    parser.add_argument('--start', help="first report date to include, YYYY-MM-DD")
+    parser.add_argument('--end', help="last report date to include, YYYY-MM-DD")
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS, help="parallel days")
+    parser.add_argument('--notify', action='store_true', help="also email each day's reports")
+    parser.add_argument('--force', action='store_true', help="rebuild days the run ledger already has")
+    args = parser.parse_args()
+
+    config = initialize_config()
+    if args.folder:
+        config['folder_path'] = args.folder
+    config['force_rebuild'] = config['force_rebuild'] or args.force
+    return run_backfill(config, start=args.start, end=args.end, workers=args.workers, notify=args.notify)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+"""
+Call Center Pipeline Benchmarks
+Times the call center pipeline on synthetic CDR data:
+1. Vectorized processing stages against the original row-by-row logic
+2. Every report stage (load ... excel) at 10k to 5M rows, with CPU time and peak memory
+3. Exact against sketched distinct-number counts: error, time and memory
+4. Streamed day totals against the in-memory load, on an export with an
+   unreadable call time (a check: it raises when they differ)
+Results are saved as JSON tagged with the git commit, so runs on different
+commits can be compared with --compare.
+
+Usage: python call_center_benchmark.py [--pipeline | --sketch] [--rows 10000,100000] [--results FILE]
+       python call_center_benchmark.py --compare BASELINE.json RESULTS.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from call_center_instrumentation import STAGE_LOG_NAME, read_stage_log
+from call_center_loader import DROPPED_CDR_COLUMNS, load_cdr, peak_rss_mb, split_cdr_by_day
+from call_center_processing import (
+    canonicalize_agent_columns,
+    clean_notes_vectorized,
+    determine_success_vectorized,
+)
+from call_center_products import partition_by_product, product_view
+from call_center_report_copy import initialize_config, run_pipeline
+from call_center_sketch import merge_sketches, sketch_estimate, sketch_values
+from call_center_stages import extract_report_date
+from call_center_streaming import stream_cdr
+from call_center_synthetic import (
+    agent_names,
+    make_synthetic_cdr,
+    make_synthetic_cdr_export,
+    write_synthetic_cdr_csv,
+    write_synthetic_inputs,
+)
+
+# ============================================================================
+# STEP 1: BENCHMARK SETTINGS
+# ============================================================================
+
+ROW_COUNTS = [100_000, 1_000_000, 5_000_000]
+
+# The row-by-row reference is too slow to run on the largest files
+MAX_LEGACY_ROWS = 1_000_000
+
+# Number of products the agents are spread over in the partitioning benchmark
+PRODUCT_COUNTS = [3, 6, 12, 24]
+PARTITION_ROWS = 1_000_000
+
+# Row counts for the end-to-end stage timings
+PIPELINE_ROW_COUNTS = [10_000, 100_000, 1_000_000, 5_000_000]
+
+# An Excel sheet holds at most 1,048,576 rows, so larger runs skip the export stage
+MAX_EXPORT_ROWS = 1_000_000
+
+# Fixed seed so every commit is measured on identical input files
+PIPELINE_SEED = 0
+
+RESULTS_DIR = 'benchmark_results'
+
+# Distinct-number sketches: precisions compared with exact counting, and the
+# number of parts (chunks or days) each sketch is built from and merged
+SKETCH_PRECISIONS = [10, 12, 14, 16]
+SKETCH_ROW_COUNTS = [100_000, 1_000_000, 5_000_000]
+SKETCH_PARTS = 10
+
+# Streaming check: a two-day export read in several chunks
+STREAM_CHECK_ROWS = 30_000
+STREAM_CHECK_CHUNK_ROWS = 7_000
+STREAM_CHECK_DAYS = 2
+
+# ============================================================================
+# STEP 2: REFERENCE LOGIC
+# ============================================================================
+
+def legacy_determine_success(row):
+    """Original row-by-row classifier, kept as the correctness reference"""
+    status = str(row['Status']).lower()
+    if status in ['no answer', 'busy', 'failed', 'voicemail']:
+        return 'Unsuccessful'
+    elif status == 'answered':
+        try:
+            talk_duration = int(row['Talk Duration'])
+            return 'Successful' if talk_duration >= 5 else 'Unsuccessful'
+        except:
+            return 'Unsuccessful'
+    else:
+        return 'Unsuccessful'
+
+
+def legacy_clean_notes(row):
+    """Original row-by-row notes cleaner, kept as the correctness reference"""
+    note = str(row['Call Notes'])
+    if note.strip() == '' or note.lower() == 'nan':
+        status = str(row['Status']).lower()
+        if status in ['no answer', 'voicemail']:
+            return 'Not picking'
+        elif status == 'failed':
+            return 'Failed Connection'
+        elif status == 'busy':
+            return 'Busy'
+        elif status == 'answered':
+            return 'NO COMMENT WRITTEN'
+        else:
+            return 'UNKNOWN'
+    else:
+        parts = note.lower().split('remark')
+        return note[:len(parts[0])].strip()
+
+
+def time_call(func, *args, **kwargs):
+    """Run func once and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+# ============================================================================
+# STEP 3: BENCHMARKS
+# ============================================================================
+
+def compare_with_legacy(label, vectorized_func, legacy_row_func,
+                        row_counts=ROW_COUNTS, max_legacy_rows=MAX_LEGACY_ROWS):
+    """Time a vectorized stage against its df.apply(axis=1) original"""
+    results = []
+    for rows in row_counts:
+        df = make_synthetic_cdr(rows)
+        vectorized, vectorized_time = time_call(vectorized_func, df)
+
+        legacy_time = None
+        if rows <= max_legacy_rows:
+            legacy, legacy_time = time_call(df.apply, legacy_row_func, axis=1)
+            if not np.array_equal(legacy.to_numpy(dtype=object), vectorized.to_numpy(dtype=object)):
+                raise AssertionError(f"Vectorized {label} differs at {rows} rows")
+
+        results.append({
+            'stage': label,
+            'rows': rows,
+            'vectorized_s': round(vectorized_time, 4),
+            'legacy_s': round(legacy_time, 4) if legacy_time is not None else None,
+            'speedup': round(legacy_time / vectorized_time, 1) if legacy_time else None,
+        })
+        legacy_text = f"{legacy_time:.2f}s" if legacy_time is not None else "skipped"
+        print(f"✓ {rows:>9,} rows | vectorized {vectorized_time:.3f}s | row-by-row {legacy_text}")
+    return results
+
+
+def benchmark_success_classification(**kwargs):
+    """Compare df.apply(determine_success) with the vectorized classifier"""
+    return compare_with_legacy('classification', determine_success_vectorized,
+                               legacy_determine_success, **kwargs)
+
+
+def benchmark_notes_cleaning(**kwargs):
+    """Compare df.apply(clean_notes) with the vectorized notes pipeline"""
+    return compare_with_legacy('notes', clean_notes_vectorized,
+                               legacy_clean_notes, **kwargs)
+
+
+def legacy_load_cdr(cdr_file):
+    """Original load: parse every column as-is, then drop the unused ones"""
+    df = pd.read_csv(cdr_file)
+    df.drop(columns=[col for col in DROPPED_CDR_COLUMNS if col in df.columns], inplace=True)
+    return df
+
+
+def _measure_load(cdr_file, engine):
+    """Load cdr_file in this (fresh) process and report time and memory"""
+    if engine == 'legacy':
+        df, seconds = time_call(legacy_load_cdr, cdr_file)
+    else:
+        (df, _), seconds = time_call(load_cdr, cdr_file, engine=engine)
+    return {
+        'seconds': round(seconds, 3),
+        'frame_mb': round(df.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def measure_in_subprocess(func, *args):
+    """Run func in a new worker process so peak RSS covers only that call"""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(func, *args).result()
+
+
+def benchmark_cdr_loading(row_counts=ROW_COUNTS, engines=('legacy', 'c', 'pyarrow')):
+    """Compare the plain read_csv + drop with the typed, column-pruned loader"""
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for rows in row_counts:
+            cdr_file = write_synthetic_cdr_csv(os.path.join(temp_dir, f"pse-cdr-{rows}.csv"), rows)
+            for engine in engines:
+                try:
+                    stats = measure_in_subprocess(_measure_load, cdr_file, engine)
+                except ImportError:
+                    print(f"⚠️ {engine} engine not available, skipping")
+                    continue
+                results.append({'stage': 'load', 'rows': rows, 'engine': engine, **stats})
+                print(f"✓ {rows:>9,} rows | {engine:<7} {stats['seconds']:.2f}s | "
+                      f"frame {stats['frame_mb']} MB | peak RSS {stats['peak_rss_mb']} MB")
+    return results
+
+
+def traced_peak_mb(func, *args):
+    """Run func once under tracemalloc and return its peak allocation in MB"""
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 ** 2
+
+
+def legacy_product_frames(df, agent_products):
+    """Original approach: one isin() scan and copy per product, for charts and again for reports"""
+    frames = []
+    for _ in ('charts', 'reports'):
+        for product in agent_products.unique():
+            names = agent_products[agent_products == product].index.tolist()
+            frames.append(df[(df['Call From'].isin(names)) | (df['Call To'].isin(names))].copy())
+    return frames
+
+
+def partitioned_product_frames(df, agent_products):
+    """One product join, then a take per product for charts and reports"""
+    partitions = partition_by_product(df, agent_products)
+    return [product_view(df, partitions, product)
+            for _ in ('charts', 'reports') for product in partitions]
+
+
+def benchmark_product_partitioning(rows=PARTITION_ROWS, product_counts=PRODUCT_COUNTS):
+    """Show how per-product filtering scales as products are added"""
+    df = canonicalize_agent_columns(make_synthetic_cdr_export(rows), aliases={})
+    agents = pd.Index(agent_names())
+
+    results = []
+    for product_count in product_counts:
+        agent_products = pd.Series([f"P{i % product_count}" for i in range(len(agents))], index=agents)
+        legacy_frames = lambda: legacy_product_frames(df, agent_products)
+        partitioned_frames = lambda: partitioned_product_frames(df.copy(deep=False), agent_products)
+
+        _, legacy_time = time_call(legacy_frames)
+        _, partition_time = time_call(partitioned_frames)
+        legacy_peak = traced_peak_mb(legacy_frames)
+        partition_peak = traced_peak_mb(partitioned_frames)
+
+        results.append({
+            'stage': 'partition',
+            'rows': rows,
+            'products': product_count,
+            'partitioned_s': round(partition_time, 3),
+            'legacy_s': round(legacy_time, 3),
+            'partitioned_peak_mb': round(partition_peak, 1),
+            'legacy_peak_mb': round(legacy_peak, 1),
+        })
+        print(f"✓ {product_count:>3} products | partitioned {partition_time:.2f}s / {partition_peak:.0f} MB "
+              f"| isin scans {legacy_time:.2f}s / {legacy_peak:.0f} MB")
+    return results
+
+
+def _run_pipeline_stages(folder, rows, export=True):
+    """
+    Run the report pipeline on the inputs in folder (in a fresh process) and
+    return its per-stage records from the instrumentation log
+    """
+    export_root = os.path.join(folder, 'NEW_FILES')
+    config = {
+        **initialize_config(),
+        'folder_path': folder,
+        'export_root': export_root,
+        'chart_cache_dir': os.path.join(export_root, '.chart_cache'),
+        'stage_log': os.path.join(export_root, STAGE_LOG_NAME),
+        'reuse_cdr_snapshot': False,
+        'write_history': False,
+        # Every timing run rebuilds, however often the same inputs are used
+        'run_ledger': None,
+    }
+
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        result = run_pipeline(config, export=export, notify=False)
+
+    records = read_stage_log(config['stage_log'], result['run_id'])
+    return [{'stage': record['stage'], 'rows': rows, 'seconds': record['wall_seconds'],
+             'cpu_seconds': record['cpu_seconds'], 'peak_rss_mb': record['peak_rss_mb']}
+            for record in records.to_dict('records')]
+
+
+def benchmark_pipeline_stages(row_counts=PIPELINE_ROW_COUNTS, seed=PIPELINE_SEED):
+    """Time each report stage on synthetic inputs of each size, one fresh process per size"""
+    results = []
+    for rows in row_counts:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_synthetic_inputs(temp_dir, rows, seed)
+            export = rows <= MAX_EXPORT_ROWS
+            timings = measure_in_subprocess(_run_pipeline_stages, temp_dir, rows, export)
+
+        results += timings
+        stage_text = " | ".join(f"{timing['stage']} {timing['seconds']:.2f}s" for timing in timings)
+        print(f"✓ {rows:>9,} rows | {stage_text} | peak RSS {timings[-1]['peak_rss_mb']} MB")
+        if not export:
+            print(f"  (export skipped: more than {MAX_EXPORT_ROWS:,} rows do not fit in an Excel sheet)")
+    return results
+
+
+def benchmark_distinct_numbers(row_counts=SKETCH_ROW_COUNTS, precisions=SKETCH_PRECISIONS,
+                               parts=SKETCH_PARTS, seed=PIPELINE_SEED):
+    """
+    Count the distinct numbers called exactly and with sketches of each
+    precision, built in parts and merged like chunks or days
+    """
+    results = []
+    for rows in row_counts:
+        export = make_synthetic_cdr_export(rows, seed)
+        numbers = export.loc[export['Communication Type'] == 'Outbound', 'Call To'].reset_index(drop=True)
+        del export
+
+        # Exact counting has to keep every distinct number
+        exact, exact_time = time_call(numbers.nunique)
+        exact_mb = pd.Series(numbers.unique()).memory_usage(deep=True) / 1024 ** 2
+        results.append({'stage': 'distinct_numbers', 'rows': rows, 'mode': 'exact', 'distinct': int(exact),
+                        'estimate': int(exact), 'error_pct': 0.0, 'seconds': round(exact_time, 3),
+                        'state_kb': round(exact_mb * 1024, 1)})
+        print(f"✓ {rows:>9,} rows | exact {exact:,} numbers | {exact_time:.3f}s | {exact_mb:.1f} MB of numbers")
+
+        for precision in precisions:
+            build = lambda: merge_sketches([sketch_values(numbers.iloc[part], precision)
+                                            for part in np.array_split(np.arange(len(numbers)), parts)], precision)
+            sketch, sketch_time = time_call(build)
+            estimate = sketch_estimate(sketch)
+            error = (estimate - exact) / exact * 100 if exact else 0.0
+            results.append({'stage': 'distinct_numbers', 'rows': rows, 'mode': f'sketch p={precision}',
+                            'distinct': int(exact), 'estimate': estimate, 'error_pct': round(error, 2),
+                            'seconds': round(sketch_time, 3), 'state_kb': len(sketch) / 1024})
+            print(f"  sketch p={precision:<2} | {estimate:,} ({error:+.2f}%) | {sketch_time:.3f}s | "
+                  f"{len(sketch) / 1024:.0f} KB per sketch")
+    return results
+
+
+
+def check_streaming_days(rows=STREAM_CHECK_ROWS, chunk_rows=STREAM_CHECK_CHUNK_ROWS, days=STREAM_CHECK_DAYS,
+                         seed=PIPELINE_SEED):
+    """
+    Stream an export whose first chunk holds a call with an unreadable time
+    next to calls on the default (first) date, and check every day's call
+    total against the in-memory load
+    """
+    export = make_synthetic_cdr_export(rows, seed, days=days)
+    export.loc[1, 'Time'] = 'not a time'
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cdr_file = os.path.join(temp_dir, 'pse-cdr-check.csv')
+        export.to_csv(cdr_file, index=False)
+        del export
+
+        df, _ = load_cdr(cdr_file)
+        expected = {report_date: len(positions)
+                    for report_date, positions in split_cdr_by_day(df['Time'], extract_report_date(df['Time'])).items()}
+        del df
+
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            aggregates, stream_time = time_call(stream_cdr, [cdr_file], chunk_rows, keep_callbacks=False)
+
+    day_totals = aggregates['summary'].groupby('Report Date', observed=True)['Calls'].sum()
+    streamed = {str(report_date): int(calls) for report_date, calls in day_totals.items()}
+    if streamed != expected:
+        raise AssertionError(f"Streamed day totals {streamed} differ from the in-memory load {expected}")
+
+    print(f"✓ {rows:>9,} rows | {aggregates['chunks']} chunks | {len(expected)} days match | {stream_time:.2f}s")
+    return [{'stage': 'streaming_days', 'rows': rows, 'chunks': aggregates['chunks'], 'days': len(expected),
+             'seconds': round(stream_time, 3)}]
+
+# ============================================================================
+# STEP 4: RESULTS FILES
+# ============================================================================
+
+def _package_version(name):
+    """Installed version of a package, or None"""
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+    return getattr(module, '__version__', None)
+
+
+def benchmark_environment():
+    """Commit and machine details stored with every results file"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--', '.'], cwd=here, capture_output=True,
+                                    text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+
+    return {
+        'commit': commit,
+        'uncommitted_changes': dirty,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': {name: _package_version(name) for name in ('numpy', 'pandas', 'pyarrow', 'xlsxwriter')},
+    }
+
+
+def save_results(benchmarks, results_file=None):
+    """Write {'environment', 'benchmarks'} to results_file (default: benchmark_results/<commit>_<time>.json)"""
+    environment = benchmark_environment()
+    if results_file is None:
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        results_file = os.path.join(RESULTS_DIR, f"{environment['commit'] or 'nogit'}_{stamp}.json")
+
+    os.makedirs(os.path.dirname(results_file) or '.', exist_ok=True)
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment, 'benchmarks': benchmarks}, f, indent=2)
+    return results_file
+
+
+def compare_results(baseline_file, results_file):
+    """Print the pipeline stage timings of two results files side by side"""
+    runs = []
+    for path in (baseline_file, results_file):
+        with open(path, 'r', encoding='utf-8') as f:
+            run = json.load(f)
+        timings = {(t['stage'], t['rows']): t for t in run['benchmarks'].get('pipeline', [])}
+        runs.append((run['environment'].get('commit'), timings))
+
+    (old_commit, old), (new_commit, new) = runs
+    print(f"{'stage':<10} {'rows':>10} {old_commit or 'baseline':>12} {new_commit or 'results':>12} {'change':>8}")
+    for key in [key for key in new if key in old]:
+        before, after = old[key]['seconds'], new[key]['seconds']
+        change = f"{(after / before - 1):+.0%}" if before else "n/a"
+        print(f"{key[0]:<10} {key[1]:>10,} {before:>11.2f}s {after:>11.2f}s {change:>8}")
+
+# ============================================================================
+# STEP 5: ENTRY POINT
+# ============================================================================
+
+def main():
+    """Run the benchmarks and save the results"""
+    parser = argparse.ArgumentParser(description="Benchmark the call center pipeline")
+    parser.add_argument('--pipeline', action='store_true', help="only run the end-to-end stage timings")
+    parser.add_argument('--sketch', action='store_true', help="only run the distinct-number sketch comparison")
+    parser.add_argument('--rows', help="comma separated row counts for the stage timings")
+    parser.add_argument('--results', help="results JSON file to write")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'RESULTS'), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    row_counts = [int(rows) for rows in args.rows.split(',')] if args.rows else PIPELINE_ROW_COUNTS
+
+    print("=" * 60)
+    print("Call Center Pipeline Benchmarks")
+    print("=" * 60)
+
+    benchmarks = {}
+    if args.sketch:
+        print("\n[BENCHMARK] Distinct numbers: exact vs sketch...")
+        benchmarks['distinct_numbers'] = benchmark_distinct_numbers(row_counts if args.rows else SKETCH_ROW_COUNTS)
+        results_file = save_results(benchmarks, args.results)
+        print(f"\n💾 Results saved: {results_file}")
+        return
+
+    if not args.pipeline:
+        print("\n[BENCHMARK] Call success classification...")
+        benchmarks['classification'] = benchmark_success_classification()
+
+        print("\n[BENCHMARK] Call notes cleaning...")
+        benchmarks['notes'] = benchmark_notes_cleaning()
+
+        print("\n[BENCHMARK] CDR loading...")
+        benchmarks['load'] = benchmark_cdr_loading()
+
+        print("\n[BENCHMARK] Product partitioning...")
+        benchmarks['partition'] = benchmark_product_partitioning()
+
+        print("\n[BENCHMARK] Distinct numbers: exact vs sketch...")
+        benchmarks['distinct_numbers'] = benchmark_distinct_numbers()
+
+        print("\n[CHECK] Streamed day totals...")
+        benchmarks['streaming_days'] = check_streaming_days()
+
+    print("\n[BENCHMARK] Pipeline stages...")
+    benchmarks['pipeline'] = benchmark_pipeline_stages(row_counts)
+
+    results_file = save_results(benchmarks, args.results)
+    print(f"\n💾 Results saved: {results_file}")
+
+
+if __name__ == "__main__":
+    main()
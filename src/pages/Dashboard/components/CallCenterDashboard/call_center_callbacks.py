@@ -0,0 +1,112 @@
+"""
+Call Center Callbacks
+Finds which missed calls were called back, and how quickly:
+1. Missed calls and return calls are matched by phone number and time with
+   one sorted as-of join (no loops over calls)
+2. Only the first return call strictly after the missed call, within a
+   configurable window, counts as its callback
+3. Callback latencies are summarized as percentiles and time buckets
+"""
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# STEP 1: CALLBACK SETTINGS
+# ============================================================================
+
+# A return call later than this does not count as a callback; None means any
+# later call in the same report
+CALLBACK_WINDOW = '2h'
+
+# Latency buckets (minutes) for the callback distribution
+LATENCY_BUCKET_EDGES = [0, 5, 15, 30, 60, 120, np.inf]
+LATENCY_BUCKET_LABELS = ['< 5 min', '5-15 min', '15-30 min', '30-60 min', '1-2 h', '2 h+']
+
+# ============================================================================
+# STEP 2: AS-OF MATCHING
+# ============================================================================
+
+def number_keys(left, right):
+    """
+    Integer keys for two phone-number columns, equal where the numbers are
+    equal and -1 where missing. Shared categoricals reuse their codes.
+    """
+    if (isinstance(left.dtype, pd.CategoricalDtype)
+            and isinstance(right.dtype, pd.CategoricalDtype)
+            and left.cat.categories.equals(right.cat.categories)):
+        return left.cat.codes.to_numpy(dtype=np.int64), right.cat.codes.to_numpy(dtype=np.int64)
+
+    codes, _ = pd.factorize(np.concatenate([left.to_numpy(dtype=object), right.to_numpy(dtype=object)]))
+    return codes[:len(left)].astype(np.int64), codes[len(left):].astype(np.int64)
+
+
+def callback_latency(missed_calls, return_calls, missed_number='Call From', return_number='Call To',
+                     window=CALLBACK_WINDOW):
+    """
+    For every missed call, the time until the first return call to the
+    same number that happened strictly after it (and within window).
+
+    Returns a timedelta Series aligned with missed_calls; NaT means the
+    call was not called back (or has no readable time).
+    """
+    missed_keys, return_keys = number_keys(missed_calls[missed_number], return_calls[return_number])
+
+    missed = pd.DataFrame({
+        'Time': missed_calls['Time'].to_numpy(),
+        'number': missed_keys,
+        'row': np.arange(len(missed_calls)),
+    })
+    missed = missed[missed['Time'].notna() & (missed['number'] >= 0)].sort_values('Time', kind='stable')
+
+    returns = pd.DataFrame({'Time': return_calls['Time'].to_numpy(), 'number': return_keys})
+    returns = returns[returns['Time'].notna() & (returns['number'] >= 0)].sort_values('Time', kind='stable')
+    returns['Callback Time'] = returns['Time']
+
+    matched = pd.merge_asof(missed, returns, on='Time', by='number', direction='forward',
+                            allow_exact_matches=False,
+                            tolerance=pd.Timedelta(window) if window is not None else None)
+
+    latency = np.full(len(missed_calls), np.timedelta64('NaT'), dtype='timedelta64[ns]')
+    latency[matched['row'].to_numpy()] = (matched['Callback Time'] - matched['Time']).to_numpy()
+    return pd.Series(latency, index=missed_calls.index, name='Callback Latency')
+
+# ============================================================================
+# STEP 3: LATENCY DISTRIBUTION
+# ============================================================================
+
+def callback_latency_summary(latency):
+    """
+    Summarize callback latencies: how many calls were called back, the
+    median / 90th percentile / mean delay in minutes and bucket counts.
+    """
+    minutes = latency.dt.total_seconds().div(60).dropna()
+    buckets = pd.cut(minutes, LATENCY_BUCKET_EDGES, labels=LATENCY_BUCKET_LABELS, right=False)
+    called_back = len(minutes)
+
+    return {
+        'missed': len(latency),
+        'called_back': called_back,
+        'called_back_pct': called_back / len(latency) if len(latency) else 0,
+        'median_minutes': round(float(minutes.median()), 1) if called_back else None,
+        'p90_minutes': round(float(minutes.quantile(0.9)), 1) if called_back else None,
+        'mean_minutes': round(float(minutes.mean()), 1) if called_back else None,
+        'buckets': {label: int(count) for label, count in
+                    buckets.value_counts(sort=False).reindex(LATENCY_BUCKET_LABELS, fill_value=0).items()},
+    }
+
+
+def latency_distribution_frame(summary):
+    """The bucket counts of a latency summary as a small table for Excel"""
+    buckets = pd.Series(summary['buckets'], name='Calls').rename_axis('Time To Call Back').reset_index()
+    buckets['Percentage'] = (buckets['Calls'] / summary['called_back'] if summary['called_back'] else 0.0)
+    buckets['Percentage'] = buckets['Percentage'].apply(lambda x: f"{x:.2%}")
+    return buckets
+
+
+def latency_sentence(summary):
+    """One report line on callback speed, or '' when nothing was called back"""
+    if not summary['called_back']:
+        return ""
+    return (f"- Median time to call back was {summary['median_minutes']} minutes; "
+            f"90% of callbacks happened within {summary['p90_minutes']} minutes.\n")
@@ -0,0 +1,303 @@
+"""
+Call Center Charts
+Renders the call center PNG charts from plain chart specs:
+1. Specs are dicts of labels, values, titles and output paths (cheap to pickle)
+2. Specs are rendered in a process pool with the headless Agg canvas
+3. Rendered PNGs are cached by a fingerprint of their spec, so reruns
+   with unchanged data copy the previous image instead of redrawing it
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from call_center_workers import map_in_pool
+
+# ============================================================================
+# STEP 1: CHART STYLE
+# ============================================================================
+
+# Stunning color palette (red to violet spectrum)
+COLORS = ['#FF6B6B', '#FF8E53', '#FFB142', '#FFD166', '#06D6A0', '#118AB2', '#6A4C93']
+
+BACKGROUND = '#f8f9fa'
+TEXT_COLOR = '#2d3436'
+CHART_DPI = 300
+
+# Worker processes for rendering; None means one per CPU core
+CHART_WORKERS = None
+
+# Bump whenever the drawing code or style changes so cached images are redrawn
+CHART_STYLE_VERSION = 1
+
+# The chart cache is trimmed to this size, dropping least recently used images
+CHART_CACHE_MAX_MB = 200
+
+# ============================================================================
+# STEP 2: CHART SPECS
+# ============================================================================
+
+def bar_chart_spec(data, title, product_name, report_date, chart_type, path):
+    """
+    Describe a bar chart of a pandas Series (index = labels) as plain data.
+    chart_type is 'barh' for horizontal bars or 'bar' for vertical bars.
+    """
+    return {
+        'kind': chart_type,
+        'labels': [str(label) for label in data.index],
+        'values': data.tolist(),
+        'title': f'{title} - {product_name} - {report_date}',
+        'path': path,
+    }
+
+
+def table_spec(table_df, title, path):
+    """Describe a table image of a DataFrame (already formatted for display)"""
+    return {
+        'kind': 'table',
+        'columns': [str(column) for column in table_df.columns],
+        'rows': table_df.values.tolist(),
+        'title': title,
+        'path': path,
+    }
+
+
+def heatmap_spec(matrix, row_labels, column_labels, title, path, scale_from_row=0):
+    """
+    Describe a heatmap of a matrix (a list of rows of numbers) as plain data.
+    The color scale is fitted to the rows from scale_from_row on, so total
+    rows placed above them do not wash them out.
+    """
+    return {
+        'kind': 'heatmap',
+        'matrix': [list(row) for row in matrix],
+        'scale_from_row': scale_from_row,
+        'row_labels': [str(label) for label in row_labels],
+        'column_labels': [str(label) for label in column_labels],
+        'title': title,
+        'path': path,
+    }
+
+# ============================================================================
+# STEP 3: RENDERING
+# ============================================================================
+
+def _new_figure(figsize):
+    """Create a figure on the Agg canvas without touching pyplot state"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _draw_bar_chart(spec):
+    """Draw a bar/barh chart with the stunning colors and styling"""
+    labels, values = spec['labels'], spec['values']
+    figure = _new_figure((12, 8))
+    ax = figure.add_subplot()
+    ax.set_facecolor(BACKGROUND)
+    positions = range(len(values))
+
+    if spec['kind'] == 'barh':
+        bars = ax.barh(positions, values, color=COLORS[:len(values)],
+                       alpha=0.8, edgecolor='white', linewidth=2)
+
+        # Add data labels on bars
+        for bar, value in zip(bars, values):
+            ax.text(bar.get_width() + bar.get_width() * 0.01, bar.get_y() + bar.get_height()/2,
+                    f'{value}', ha='left', va='center', fontsize=10, fontweight='bold', color=TEXT_COLOR)
+
+        ax.set_yticks(positions, labels, fontsize=11)
+        ax.set_xlabel('Number of Calls', fontsize=12, fontweight='bold', color=TEXT_COLOR)
+
+    else:
+        bars = ax.bar(positions, values, color=COLORS[:len(values)],
+                      alpha=0.8, edgecolor='white', linewidth=2)
+
+        # Add data labels on bars
+        for bar, value in zip(bars, values):
+            ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + bar.get_height() * 0.01,
+                    f'{value}', ha='center', va='bottom', fontsize=10, fontweight='bold', color=TEXT_COLOR)
+
+        ax.set_xticks(positions, labels, rotation=45, ha='right', fontsize=11)
+        ax.set_ylabel('Number of Calls', fontsize=12, fontweight='bold', color=TEXT_COLOR)
+
+    # Styling
+    ax.set_title(spec['title'], fontsize=14, fontweight='bold', pad=20, color=TEXT_COLOR)
+    ax.grid(axis='x' if spec['kind'] == 'barh' else 'y', alpha=0.3, linestyle='--', linewidth=0.5)
+    figure.tight_layout()
+
+    # Remove spines
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    return figure
+
+
+def _draw_table(spec):
+    """Draw the agent performance table image"""
+    columns, rows = spec['columns'], spec['rows']
+    figure = _new_figure((12, max(3, len(rows)*0.4)))
+    ax = figure.add_subplot()
+    ax.axis('off')
+    ax.set_title(spec['title'], fontsize=16, fontweight='bold', pad=20, color=TEXT_COLOR)
+
+    # Create table with better styling
+    table = ax.table(cellText=rows,
+                     colLabels=columns,
+                     cellLoc='center', loc='center',
+                     colColours=["#1F1BEF"] * len(columns))  # Header color
+
+    table.auto_set_font_size(False)
+    table.set_fontsize(10)
+    table.auto_set_column_width(col=list(range(len(columns))))
+
+    # Style the table
+    for (i, j), cell in table.get_celld().items():
+        if i == 0:  # Header row
+            cell.set_text_props(weight='bold', color='white')
+            cell.set_facecolor("#0B1EEF")
+        else:
+            cell.set_facecolor('#f8f9fa' if i % 2 == 0 else '#e9ecef')
+
+    figure.tight_layout()
+    return figure
+
+
+def _draw_heatmap(spec):
+    """Draw a heatmap with a count in every non-empty cell"""
+    matrix, row_labels, column_labels = spec['matrix'], spec['row_labels'], spec['column_labels']
+    figure = _new_figure((max(12, len(column_labels) * 0.35), max(4, len(row_labels) * 0.4 + 2)))
+    ax = figure.add_subplot()
+    scaled_rows = matrix[spec['scale_from_row']:] or matrix
+    vmax = max([max(row, default=0) for row in scaled_rows], default=0) or 1
+    image = ax.imshow(matrix, aspect='auto', cmap='YlOrRd', vmin=0, vmax=vmax)
+    figure.colorbar(image, ax=ax, label='Number of Calls')
+
+    ax.set_xticks(range(len(column_labels)), column_labels, rotation=90, fontsize=9)
+    ax.set_yticks(range(len(row_labels)), row_labels, fontsize=9)
+
+    # Label cells only when they are large enough to read
+    if len(column_labels) <= 24:
+        for i, row in enumerate(matrix):
+            for j, value in enumerate(row):
+                if value:
+                    ax.text(j, i, f'{value}', ha='center', va='center', fontsize=7,
+                            color='white' if value > 0.6 * vmax else TEXT_COLOR)
+
+    ax.set_title(spec['title'], fontsize=14, fontweight='bold', pad=20, color=TEXT_COLOR)
+    figure.tight_layout()
+    return figure
+
+
+def render_chart(spec):
+    """Render one chart spec to its PNG path and return the path"""
+    if spec['kind'] == 'table':
+        figure = _draw_table(spec)
+    elif spec['kind'] == 'heatmap':
+        figure = _draw_heatmap(spec)
+    else:
+        figure = _draw_bar_chart(spec)
+    figure.savefig(spec['path'], dpi=CHART_DPI, bbox_inches='tight', facecolor=BACKGROUND)
+    return spec['path']
+
+
+def render_charts(specs, workers=CHART_WORKERS, spawn_safe=False):
+    """
+    Render chart specs in a process pool and return the written paths.
+
+    Platforms without 'fork' (Windows) start workers by re-importing the
+    main script, so the pool is only used there when spawn_safe is True,
+    i.e. the calling script keeps its work under `if __name__ == "__main__"`.
+    Otherwise (or for a single chart) charts are rendered in this process.
+    """
+    return map_in_pool(render_chart, specs, workers, spawn_safe)
+
+# ============================================================================
+# STEP 4: RENDER CACHE
+# ============================================================================
+
+def chart_fingerprint(spec):
+    """Hash everything that affects a chart's pixels (not its output path)"""
+    content = {key: value for key, value in spec.items() if key != 'path'}
+    content['style_version'] = CHART_STYLE_VERSION
+    content['dpi'] = CHART_DPI
+    payload = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def evict_chart_cache(cache_dir, max_mb=CHART_CACHE_MAX_MB):
+    """
+    Delete least recently used cached images until the cache fits max_mb.
+    Other processes (e.g. backfill workers) may share the cache, so images
+    they already removed are skipped.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.png'):
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    limit = max_mb * 1024 ** 2
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        total -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        evicted += 1
+    return evicted
+
+
+def copy_from_cache(cached_path, path):
+    """Copy a cached image to path; False if another process evicted it first"""
+    try:
+        shutil.copyfile(cached_path, path)
+        # Refresh the timestamp so eviction sees it as recently used
+        os.utime(cached_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def add_to_cache(path, cached_path):
+    """Store a rendered image; written under a temporary name and renamed, so readers never see half a file"""
+    temp_path = f"{cached_path}.{os.getpid()}.tmp"
+    shutil.copyfile(path, temp_path)
+    os.replace(temp_path, cached_path)
+
+
+def render_charts_cached(specs, cache_dir, max_mb=CHART_CACHE_MAX_MB, **render_options):
+    """
+    Render chart specs, reusing cached PNGs whose fingerprint matches.
+
+    Returns a dict with the written 'paths' and 'hits', 'misses' and
+    'evicted' counters. Extra options are passed on to render_charts().
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    specs = list(specs)
+    cached_paths = [os.path.join(cache_dir, f"{chart_fingerprint(spec)}.png") for spec in specs]
+
+    misses = [(spec, cached_path) for spec, cached_path in zip(specs, cached_paths)
+              if not copy_from_cache(cached_path, spec['path'])]
+
+    render_charts([spec for spec, _ in misses], **render_options)
+    for spec, cached_path in misses:
+        add_to_cache(spec['path'], cached_path)
+
+    return {
+        'paths': [spec['path'] for spec in specs],
+        'hits': len(specs) - len(misses),
+        'misses': len(misses),
+        'evicted': evict_chart_cache(cache_dir, max_mb),
+    }
@@ -11,7 +11,10 @@ from dotenv import load_dotenv
 
 global report_date
 def send_product_email(product_name, product_dir,  report_date, sender_email, sender_password):
-    """Send product-specific email with inline images and attachments"""
+    """
+    Send product-specific email with inline images and attachments.
+    Returns True when sent, False when sending failed, None when there was nothing to send.
+    """
     
     # Define receiver emails based on product
     if product_name == 'LBF':
@@ -80,7 +83,7 @@ def send_product_email(product_name, product_dir,  report_date, sender_email, se
             email_content = f.read()
     except Exception as e:
         print(f"❌ Error reading text file for {product_name}: {e}")
-        return
+        return False
     
     # Create image mapping
     image_mapping = {}
@@ -96,6 +99,8 @@ def send_product_email(product_name, product_dir,  report_date, sender_email, se
             image_mapping['top_agents'] = image_path
         elif 'status_distribution' in image_file:
             image_mapping['status_distribution'] = image_path
+        elif 'intraday_heatmap' in image_file:
+            image_mapping['intraday_heatmap'] = image_path
     
     # Create HTML email with inline images
     html_content = create_html_email_with_images(email_content, image_mapping, product_name, report_date)
@@ -168,9 +173,11 @@ def send_product_email(product_name, product_dir,  report_date, sender_email, se
         
         server.quit()
         print(f"✅ {product_name} email sent to all recipients!")
+        return True
         
     except Exception as e:
         print(f"❌ Error sending {product_name} email: {e}")
+        return False
 
 def create_html_email_with_images(text_content, image_mapping, product_name, report_date):
     """Create beautiful HTML email with images inserted at the right locations"""
@@ -218,7 +225,7 @@ def create_html_email_with_images(text_content, image_mapping, product_name, rep
                 </div>
                 ''')
                 
-        elif "had 50 or more successful calls for the day" in line:
+        elif "or more successful calls for the day" in line:
             html_paragraphs.append(f'<p style="margin: 10px 0; line-height: 1.6;">{line}</p>')
             if image_mapping.get('top_agents'):
                 image_cid = f"top_agents_{product_name}@callcenter"
@@ -228,6 +235,14 @@ def create_html_email_with_images(text_content, image_mapping, product_name, rep
                     <img src="cid:{image_cid}" style="max-width: 90%; height: auto; border: 2px solid #9b59b6; border-radius: 8px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
                 </div>
                 ''')
+            if image_mapping.get('intraday_heatmap'):
+                image_cid = f"intraday_heatmap_{product_name}@callcenter"
+                html_paragraphs.append(f'''
+                <div style="text-align: center; margin: 20px 0; padding: 15px; background: #f8f9fa; border-radius: 8px;">
+                    <h3 style="color: #2c3e50; margin-bottom: 15px;">🕒 Calls by Time of Day</h3>
+                    <img src="cid:{image_cid}" style="max-width: 90%; height: auto; border: 2px solid #e67e22; border-radius: 8px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                </div>
+                ''')
                 
         elif "were called back" in line:
             html_paragraphs.append(f'<p style="margin: 10px 0; line-height: 1.6;">{line}</p>')
@@ -413,8 +428,11 @@ def create_html_email_with_images(text_content, image_mapping, product_name, rep
     
     return html_template
 
-def send_all_product_emails(export_root, report_date, sender_email, sender_password):
-    """Send emails for all products"""
+def send_all_product_emails(export_root, report_date, sender_email, sender_password, products=None):
+    """
+    Send emails for all products (or only the given ones).
+    Returns {product: True / False / None} as from send_product_email().
+    """
     
     # Define product directories
     product_dirs = {
@@ -422,16 +440,22 @@ def send_all_product_emails(export_root, report_date, sender_email, sender_passw
         'CS': os.path.join(export_root, 'CS', report_date),
         'ERR': os.path.join(export_root, 'ERR', report_date)
     }
+    if products is not None:
+        product_dirs = {product: product_dir for product, product_dir in product_dirs.items() if product in products}
     
     print("📧 Starting email automation...")
     
     # Send emails for each product
+    results = {}
     for product_name, product_dir in product_dirs.items():
         if os.path.exists(product_dir):
             print(f"📧 Preparing {product_name} email...")
-            send_product_email(product_name, product_dir, report_date, sender_email, sender_password)
+            results[product_name] = send_product_email(product_name, product_dir, report_date, sender_email,
+                                                       sender_password)
         else:
             print(f"⚠️ No directory found for {product_name}: {product_dir}")
+            results[product_name] = None
+    return results
 
 def main_email_automation():
     """Main function to run email automation"""
@@ -457,8 +481,11 @@ def main_email_automation():
     print("✅ Email automation completed!")
 
 # Integration with your call center report
-def integrate_email_automation(export_root, report_date):
-    """Function to integrate email automation with your existing report"""
+def integrate_email_automation(export_root, report_date, products=None):
+    """
+    Function to integrate email automation with your existing report.
+    Returns the send result of each product (see send_all_product_emails).
+    """
     
     # Load environment variables from .env file
     load_dotenv()
@@ -471,7 +498,7 @@ def integrate_email_automation(export_root, report_date):
     print("STARTING EMAIL AUTOMATION")
     print("="*50)
     
-    send_all_product_emails(export_root, report_date, sender_email, sender_password)
+    return send_all_product_emails(export_root, report_date, sender_email, sender_password, products)
 
 # Run if executed directly
 if __name__ == "__main__":
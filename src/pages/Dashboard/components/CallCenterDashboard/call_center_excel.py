@@ -0,0 +1,181 @@
+"""
+Call Center Excel Export
+Streams DataFrames into .xlsx workbooks row by row:
+1. xlsxwriter in constant_memory mode when it is installed
+2. openpyxl write_only mode otherwise
+3. Several workbooks written in parallel worker processes
+4. Sheets can name rows of a shared frame (shared_rows) instead of holding
+   a copy, so per-product call sheets are not pickled into the workers
+Memory use stays flat no matter how many rows are written.
+"""
+
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+from call_center_loader import CDR_TIME_FORMAT
+from call_center_workers import is_forked, map_in_pool, pool_context
+
+# ============================================================================
+# STEP 1: EXPORT SETTINGS
+# ============================================================================
+
+# Rows converted to Python values at a time while streaming
+EXCEL_CHUNK_ROWS = 50_000
+
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+# Worker processes for writing workbooks; None means one per CPU core
+EXCEL_WORKERS = None
+
+# Parsed CDR times are written back as the export's text, as in the original
+# reports (unreadable times were parsed to NaT and are left empty)
+TEXT_TIME_COLUMNS = {'Time': CDR_TIME_FORMAT}
+
+# The frame shared_rows() sheets read from; set by write_workbooks() before
+# the pool forks so the workers inherit it instead of unpickling a copy
+_SHARED_FRAME = None
+
+# ============================================================================
+# STEP 2: ROW STREAMING
+# ============================================================================
+
+def iter_excel_rows(df, index=False, chunk_rows=EXCEL_CHUNK_ROWS, positions=None):
+    """
+    Yield the header and then each row of df (or of its rows at positions)
+    as a tuple of plain Python values. Missing values become None so both
+    engines write empty cells.
+    """
+    frame = df.reset_index() if index else df
+    yield tuple(str(column) for column in frame.columns)
+
+    row_count = len(frame) if positions is None else len(positions)
+    for start in range(0, row_count, chunk_rows):
+        if positions is None:
+            chunk = frame.iloc[start:start + chunk_rows]
+        else:
+            chunk = frame.take(positions[start:start + chunk_rows])
+        chunk = text_times(chunk).astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            yield tuple(value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+                        for value in row)
+
+
+def text_times(chunk):
+    """chunk with its TEXT_TIME_COLUMNS datetimes formatted back to text"""
+    columns = [column for column in TEXT_TIME_COLUMNS
+               if column in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk[column])]
+    if not columns:
+        return chunk
+    return chunk.assign(**{column: chunk[column].dt.strftime(TEXT_TIME_COLUMNS[column]) for column in columns})
+
+
+def shared_rows(positions):
+    """A sheet of the rows at positions of the frame passed to write_workbooks(shared_frame=...)"""
+    return {'shared_rows': positions}
+
+
+def uses_shared_frame(sheets):
+    """True when any sheet of a workbook reads the shared frame"""
+    return any(isinstance(sheet, dict) for sheet in sheets.values())
+
+
+def sheet_rows(sheet):
+    """
+    Rows of one sheet: a DataFrame, a (DataFrame, index) pair, shared_rows()
+    of the shared frame, or a list of row tuples (header first) already built
+    with iter_excel_rows(), which lets the same sheet go into several
+    workbooks without converting it again.
+    """
+    if isinstance(sheet, list):
+        return iter(sheet)
+    if isinstance(sheet, dict):
+        return iter_excel_rows(_SHARED_FRAME, positions=sheet['shared_rows'])
+    df, index = sheet if isinstance(sheet, tuple) else (sheet, False)
+    return iter_excel_rows(df, index=index)
+
+# ============================================================================
+# STEP 3: WORKBOOK WRITERS
+# ============================================================================
+
+def _write_with_xlsxwriter(path, sheets):
+    """Write sheets with xlsxwriter, flushing each row as it is written"""
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'default_date_format': DATETIME_FORMAT,
+        'nan_inf_to_errors': True,
+    })
+    try:
+        header_format = workbook.add_format({'bold': True})
+        for sheet_name, sheet in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name)
+            rows = sheet_rows(sheet)
+            worksheet.write_row(0, 0, next(rows), header_format)
+            for row_number, row in enumerate(rows, start=1):
+                worksheet.write_row(row_number, 0, row)
+    finally:
+        workbook.close()
+
+
+def _write_with_openpyxl(path, sheets):
+    """Write sheets with openpyxl in write_only mode"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, sheet in sheets.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in sheet_rows(sheet):
+            worksheet.append(row)
+    workbook.save(path)
+
+
+def write_streamed_workbook(path, sheets):
+    """
+    Write a workbook without holding it in memory.
+
+    sheets maps sheet name -> DataFrame, -> (DataFrame, index) to also
+    write the index as leading columns, -> shared_rows(), or -> a list of
+    prepared rows (see sheet_rows). Sheets are written in order.
+    """
+    if xlsxwriter is not None:
+        _write_with_xlsxwriter(path, sheets)
+    else:
+        _write_with_openpyxl(path, sheets)
+    return path
+
+# ============================================================================
+# STEP 4: PARALLEL WORKBOOKS
+# ============================================================================
+
+def _write_workbook_job(job):
+    """Process pool entry point: write one (path, sheets) workbook"""
+    path, sheets = job
+    return write_streamed_workbook(path, sheets)
+
+
+def write_workbooks(jobs, workers=EXCEL_WORKERS, spawn_safe=False, shared_frame=None):
+    """
+    Write several (path, sheets) workbooks in a process pool and return
+    their paths. As with render_charts(), platforms without 'fork' only use
+    the pool when spawn_safe is True; otherwise workbooks are written in turn.
+
+    shared_rows() sheets read shared_frame. Forked workers inherit it; spawned
+    workers would each need a pickled copy, so those workbooks are written
+    in this process while the others go to the pool.
+    """
+    global _SHARED_FRAME
+
+    jobs = list(jobs)
+    in_pool = [is_forked(pool_context(spawn_safe)) or not uses_shared_frame(sheets) for _, sheets in jobs]
+
+    _SHARED_FRAME = shared_frame
+    try:
+        pooled = iter(map_in_pool(_write_workbook_job, [job for job, pool in zip(jobs, in_pool) if pool],
+                                  workers, spawn_safe))
+        return [next(pooled) if pool else _write_workbook_job(job) for job, pool in zip(jobs, in_pool)]
+    finally:
+        _SHARED_FRAME = None
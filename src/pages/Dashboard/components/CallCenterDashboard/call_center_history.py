@@ -0,0 +1,191 @@
+"""
+Call Center History Store
+Keeps every run's agent and product metrics in a Parquet dataset:
+1. One partition per report date and product (history/<dataset>/report_date=.../product=...)
+2. Rerunning a day replaces that day's partition, other days are never rewritten
+3. Queries read only the partitions they need (week-to-date, month-to-date,
+   agent trends) instead of re-opening old Excel reports
+"""
+
+import os
+import shutil
+
+import pandas as pd
+
+from call_center_loader import SNAPSHOT_COMPRESSION, pa, pq
+from call_center_metrics import AGENT_PERFORMANCE_COLUMNS
+from call_center_processing import SUCCESS_LABEL
+from call_center_products import product_view
+
+# ============================================================================
+# STEP 1: HISTORY LAYOUT
+# ============================================================================
+
+# The history store lives in this sub-folder of NEW_FILES
+HISTORY_DIR_NAME = 'history'
+
+AGENT_DATASET = 'agents'
+PRODUCT_DATASET = 'products'
+
+# Count columns that can be summed across days (rates are recomputed from them)
+AGENT_COUNT_COLUMNS = ['outbound_calls', 'inbound_calls', 'Total Calls', 'Successful Calls']
+PRODUCT_COUNT_COLUMNS = ['Total Calls', 'Successful Calls', 'Inbound Calls', 'Outbound Calls', 'Internal Calls']
+
+
+def history_dir_path(export_root):
+    """Return the history store location for an export folder"""
+    return os.path.join(export_root, HISTORY_DIR_NAME)
+
+
+def _partitioning():
+    """Hive partitioning with both keys read back as plain strings"""
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([('report_date', pa.string()), ('product', pa.string())]),
+                           flavor='hive')
+
+# ============================================================================
+# STEP 2: WRITING A DAY
+# ============================================================================
+
+def product_day_summary(df, product_partitions, count_column=None):
+    """
+    Daily call totals per product, one row per product. df holds call rows,
+    or pre-aggregated rows whose count_column says how many calls each is.
+    """
+    rows = []
+    for product in product_partitions:
+        product_df = product_view(df, product_partitions, product)
+        calls = product_df[count_column] if count_column else pd.Series(1, index=product_df.index)
+        directions = calls.groupby(product_df['Communication Type'], observed=True).sum()
+        rows.append({
+            'Product': product,
+            'Total Calls': int(calls.sum()),
+            'Successful Calls': int(calls[product_df['Successful ?'] == SUCCESS_LABEL].sum()),
+            'Inbound Calls': int(directions.get('Inbound', 0)),
+            'Outbound Calls': int(directions.get('Outbound', 0)),
+            'Internal Calls': int(directions.get('Internal', 0)),
+        })
+    return pd.DataFrame(rows, columns=['Product'] + PRODUCT_COUNT_COLUMNS)
+
+
+def write_history_day(history_dir, dataset, table_df, report_date):
+    """
+    Store one report date of a dataset, one Parquet file per product.
+    The day is written to a hidden temporary folder and swapped in with
+    renames (old day out, new day in, then the old one deleted), so a rerun
+    replaces the whole day and readers see the old or the new day, never a
+    mix of the two. Between the two renames the day is briefly absent; a run
+    killed there leaves the old day in a hidden folder, restored by the next
+    write of that date.
+    """
+    day_dir = os.path.join(history_dir, dataset, f"report_date={report_date}")
+    temp_dir = os.path.join(history_dir, dataset, f".report_date={report_date}.tmp")
+    old_dir = os.path.join(history_dir, dataset, f".report_date={report_date}.old")
+    if os.path.isdir(old_dir):
+        if os.path.isdir(day_dir):
+            shutil.rmtree(old_dir)
+        else:
+            os.replace(old_dir, day_dir)
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+    for product, product_df in table_df.groupby('Product', sort=True):
+        product_dir = os.path.join(temp_dir, f"product={product}")
+        os.makedirs(product_dir)
+        table = pa.Table.from_pandas(product_df.drop(columns='Product'), preserve_index=False)
+        pq.write_table(table, os.path.join(product_dir, 'part-0.parquet'), compression=SNAPSHOT_COMPRESSION)
+
+    os.makedirs(temp_dir, exist_ok=True)
+    if os.path.isdir(day_dir):
+        os.replace(day_dir, old_dir)
+    os.replace(temp_dir, day_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return day_dir
+
+
+def append_run_history(export_root, report_date, agents_df, df, product_partitions, count_column=None):
+    """Add one day's agent and product metrics to the history store"""
+    if pq is None:
+        print("⚠️ pyarrow not installed, skipping the metrics history")
+        return None
+
+    history_dir = history_dir_path(export_root)
+    write_history_day(history_dir, AGENT_DATASET, agents_df[AGENT_PERFORMANCE_COLUMNS + ['Product']], report_date)
+    write_history_day(history_dir, PRODUCT_DATASET, product_day_summary(df, product_partitions, count_column),
+                      report_date)
+    return history_dir
+
+# ============================================================================
+# STEP 3: QUERIES
+# ============================================================================
+
+def read_history(history_dir, dataset=AGENT_DATASET, start=None, end=None, products=None,
+                 agents=None, columns=None):
+    """
+    Read history rows between start and end ('YYYY-MM-DD', inclusive),
+    optionally only for some products and (agent dataset) agent names.
+    Only the matching date/product partitions are opened.
+    """
+    import pyarrow.dataset as ds
+
+    dataset_dir = os.path.join(history_dir, dataset)
+    if pq is None or not os.path.isdir(dataset_dir):
+        return pd.DataFrame()
+
+    history = ds.dataset(dataset_dir, format='parquet', partitioning=_partitioning(),
+                         exclude_invalid_files=True)
+    condition = None
+    for clause in [
+        ds.field('report_date') >= start if start else None,
+        ds.field('report_date') <= end if end else None,
+        ds.field('product').isin(list(products)) if products else None,
+        ds.field('Agent Name').isin(list(agents)) if agents else None,
+    ]:
+        if clause is not None:
+            condition = clause if condition is None else condition & clause
+
+    if columns is not None:
+        columns = list(dict.fromkeys(['report_date', 'product'] + list(columns)))
+    table = history.to_table(columns=columns, filter=condition)
+    return table.to_pandas().sort_values(['report_date', 'product'], kind='stable').reset_index(drop=True)
+
+
+def summarize_agents(history_df):
+    """Sum agent counts over the days in history_df and recompute the success rate"""
+    if history_df.empty:
+        return pd.DataFrame(columns=['Agent Name', 'product', 'Days'] + AGENT_COUNT_COLUMNS + ['Success Rate (%)'])
+
+    totals = history_df.groupby(['Agent Name', 'product'], sort=False).agg(
+        Days=('report_date', 'nunique'), **{column: (column, 'sum') for column in AGENT_COUNT_COLUMNS})
+    totals['Success Rate (%)'] = totals['Successful Calls'] / totals['Total Calls'] * 100
+    return totals.reset_index().sort_values('Successful Calls', ascending=False, kind='stable')
+
+
+def period_to_date(history_dir, as_of, period, products=None):
+    """Per-agent totals from the start of the week ('W') or month ('M') up to as_of"""
+    as_of = pd.Timestamp(as_of)
+    if period == 'W':
+        start = as_of - pd.Timedelta(days=as_of.weekday())
+    elif period == 'M':
+        start = as_of.replace(day=1)
+    else:
+        raise ValueError(f"period must be 'W' or 'M', not {period!r}")
+
+    history_df = read_history(history_dir, AGENT_DATASET, start.strftime('%Y-%m-%d'),
+                              as_of.strftime('%Y-%m-%d'), products)
+    return summarize_agents(history_df)
+
+
+def week_to_date(history_dir, as_of, products=None):
+    """Per-agent totals from Monday of as_of's week up to as_of"""
+    return period_to_date(history_dir, as_of, 'W', products)
+
+
+def month_to_date(history_dir, as_of, products=None):
+    """Per-agent totals from the first of as_of's month up to as_of"""
+    return period_to_date(history_dir, as_of, 'M', products)
+
+
+def agent_trend(history_dir, agent_names, start=None, end=None):
+    """Daily rows for the given agents, one per agent and report date"""
+    return read_history(history_dir, AGENT_DATASET, start, end, agents=agent_names)
@@ -0,0 +1,145 @@
+"""
+Call Center Pipeline Instrumentation
+Measures every stage of the report pipeline:
+1. Wall time, CPU time (including finished chart/Excel worker processes),
+   peak RSS and row count per stage
+2. One JSON line per stage appended to NEW_FILES/pipeline_stages.jsonl,
+   tagged with the run id and report date
+3. An optional cProfile or pyinstrument profile for the stages listed in
+   config['profile_stages'], saved to NEW_FILES/profiles
+"""
+
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from call_center_loader import peak_rss_mb
+
+# ============================================================================
+# STEP 1: INSTRUMENTATION SETTINGS
+# ============================================================================
+
+STAGE_LOG_NAME = 'pipeline_stages.jsonl'
+PROFILE_DIR_NAME = 'profiles'
+
+# 'cprofile' (standard library, .prof files for snakeviz/pstats) or
+# 'pyinstrument' (.html call trees, falls back to cProfile when not installed)
+DEFAULT_PROFILER = 'cprofile'
+
+
+def new_run_id():
+    """Identifier shared by every stage record of one pipeline run"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+
+def cpu_seconds():
+    """CPU time of this process plus its finished child processes"""
+    seconds = time.process_time()
+    try:
+        import resource
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        seconds += children.ru_utime + children.ru_stime
+    except ImportError:
+        pass
+    return seconds
+
+# ============================================================================
+# STEP 2: PROFILERS
+# ============================================================================
+
+def start_profiler(profiler=DEFAULT_PROFILER):
+    """Start profiling this process; returns (kind, profiler)"""
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            session = Profiler()
+            session.start()
+            return 'pyinstrument', session
+        except ImportError:
+            print("⚠️ pyinstrument not installed, profiling with cProfile instead")
+
+    session = cProfile.Profile()
+    session.enable()
+    return 'cprofile', session
+
+
+def save_profile(kind, session, path_stem):
+    """Stop a profiler started by start_profiler() and save its output"""
+    if kind == 'pyinstrument':
+        session.stop()
+        path = f"{path_stem}.html"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(session.output_html())
+    else:
+        session.disable()
+        path = f"{path_stem}.prof"
+        session.dump_stats(path)
+    return path
+
+# ============================================================================
+# STEP 3: STAGE RECORDS
+# ============================================================================
+
+def write_stage_record(stage_log, record):
+    """Append one stage record to the JSON lines log"""
+    os.makedirs(os.path.dirname(stage_log) or '.', exist_ok=True)
+    with open(stage_log, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+@contextmanager
+def instrument_stage(config, stage, report_date=None, rows=None):
+    """
+    Time the block as one pipeline stage and log it to config['stage_log'].
+    Yields the record, so rows can be filled in once they are known.
+    """
+    record = {
+        'run_id': config.get('run_id'),
+        'report_date': report_date,
+        'stage': stage,
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'rows': rows,
+    }
+
+    profile = None
+    if stage in (config.get('profile_stages') or ()):
+        profile = start_profiler(config.get('profiler', DEFAULT_PROFILER))
+
+    wall_start = time.perf_counter()
+    cpu_start = cpu_seconds()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - wall_start, 3)
+        record['cpu_seconds'] = round(cpu_seconds() - cpu_start, 3)
+        record['peak_rss_mb'] = peak_rss_mb()
+
+        if profile is not None:
+            profile_dir = os.path.join(config['export_root'], PROFILE_DIR_NAME)
+            os.makedirs(profile_dir, exist_ok=True)
+            stem = '_'.join(part for part in [record['run_id'], report_date, stage] if part)
+            record['profile'] = save_profile(*profile, os.path.join(profile_dir, stem))
+
+        print(f"⏱️  {stage}: {record['wall_seconds']:.2f}s wall, {record['cpu_seconds']:.2f}s CPU, "
+              f"peak RSS {record['peak_rss_mb']} MB")
+        if config.get('stage_log'):
+            write_stage_record(config['stage_log'], record)
+
+# ============================================================================
+# STEP 4: READING THE LOG
+# ============================================================================
+
+def read_stage_log(stage_log, run_id=None):
+    """Stage records as a DataFrame, optionally for one run only"""
+    if not os.path.exists(stage_log):
+        return pd.DataFrame()
+
+    records = pd.read_json(stage_log, lines=True, dtype={'report_date': str, 'run_id': str})
+    if run_id is not None:
+        records = records[records['run_id'] == run_id].reset_index(drop=True)
+    return records
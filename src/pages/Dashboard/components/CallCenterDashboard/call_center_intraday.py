@@ -0,0 +1,174 @@
+"""
+Call Center Intraday Profile
+When the day's calls were made, and by which agents:
+1. Calls are bucketed by time slot (hour, or 15/30 minutes) x agent x
+   direction x outcome in one grouped pass over the day's calls
+2. The long profile table merges by summing, so product slices and
+   streamed chunks give the same profile
+3. The profile is written as a compact JSON heatmap matrix (agents x
+   slots, plus per-direction and per-outcome slot totals) for the
+   dashboard, and as a heatmap image for the product emails
+Outbound and internal calls belong to the calling agent, inbound calls to
+the receiving agent; calls without a readable time are left out.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from call_center_charts import heatmap_spec
+from call_center_metrics import agent_key, row_calls
+from call_center_products import partition_by_product
+
+# ============================================================================
+# STEP 1: PROFILE SETTINGS
+# ============================================================================
+
+# Slot length in minutes; 60 gives an hourly profile, 15 a quarter-hour one
+INTRADAY_SLOT_MINUTES = 60
+SLOT_MINUTES_CHOICES = (15, 30, 60)
+
+PROFILE_KEYS = ['Slot', 'Agent Name', 'Communication Type', 'Successful ?']
+
+# Bump when the JSON layout changes so readers can tell old files apart
+INTRADAY_FORMAT_VERSION = 1
+
+# The heatmap image shows the busiest agents only, under an all-agents row
+HEATMAP_MAX_AGENTS = 25
+ALL_AGENTS_LABEL = 'All agents'
+
+
+def check_slot_minutes(slot_minutes):
+    """The slot length as an int, if it is one of SLOT_MINUTES_CHOICES"""
+    if int(slot_minutes) not in SLOT_MINUTES_CHOICES:
+        raise ValueError(f"Intraday slots must be one of {SLOT_MINUTES_CHOICES} minutes, got {slot_minutes}")
+    return int(slot_minutes)
+
+
+def slot_labels(slot_minutes=INTRADAY_SLOT_MINUTES):
+    """'HH:MM' start time of every slot of a day"""
+    return [f"{start // 60:02d}:{start % 60:02d}" for start in range(0, 24 * 60, slot_minutes)]
+
+# ============================================================================
+# STEP 2: PROFILE TABLE
+# ============================================================================
+
+def time_slots(times, slot_minutes=INTRADAY_SLOT_MINUTES):
+    """Slot number of every call time within its day; -1 where the time is missing"""
+    slots = (times - times.dt.normalize()) // pd.Timedelta(minutes=slot_minutes)
+    return slots.fillna(-1).to_numpy(dtype=np.int16)
+
+
+def intraday_profile(df, slot_minutes=INTRADAY_SLOT_MINUTES, excluded_agents=(), count_column=None,
+                     extra_keys=()):
+    """
+    Calls per slot x agent x direction x outcome in one grouped pass, as a
+    long table with PROFILE_KEYS (after any extra_keys, e.g. 'Report Date')
+    and 'Calls'. Accepts pre-aggregated rows like agent_performance().
+    """
+    slot_minutes = check_slot_minutes(slot_minutes)
+    direction = df['Communication Type']
+    inbound = (direction == 'Inbound').to_numpy()
+    slots = time_slots(df['Time'], slot_minutes)
+
+    rows = pd.DataFrame({
+        **{key: df[key].values for key in extra_keys},
+        'Slot': slots,
+        'Agent Name': agent_key(df, ~inbound, inbound),
+        'Communication Type': direction.values,
+        'Successful ?': df['Successful ?'].to_numpy(dtype=object),
+        'Calls': np.broadcast_to(row_calls(df, count_column), len(df)),
+    })[slots >= 0]
+
+    keys = list(extra_keys) + PROFILE_KEYS
+    profile = rows.groupby(keys, observed=True, sort=False)['Calls'].sum().reset_index()
+    return profile[~profile['Agent Name'].isin(list(excluded_agents))].reset_index(drop=True)
+
+
+def profile_partitions(profile, agents_df):
+    """{product: profile row positions}, by the product of each row's agent"""
+    return partition_by_product(profile, agents_df.set_index('Agent Name')['Product'], columns=('Agent Name',))
+
+# ============================================================================
+# STEP 3: HEATMAP MATRIX
+# ============================================================================
+
+def slot_totals(profile, column, slot_count):
+    """{value of column: calls per slot} for a profile table"""
+    totals = {}
+    for value, rows in profile.groupby(column, observed=True, sort=False):
+        counts = np.bincount(rows['Slot'].to_numpy(), weights=rows['Calls'].to_numpy(), minlength=slot_count)
+        totals[str(value)] = counts.astype(np.int64).tolist()
+    return dict(sorted(totals.items()))
+
+
+def profile_matrix(profile, slot_minutes=INTRADAY_SLOT_MINUTES):
+    """
+    The heatmap matrix of a profile table as JSON-ready lists: agents
+    (busiest first) x slots, slot totals per direction and outcome, and
+    the full-resolution cells as [slot, agent, direction, outcome, calls]
+    rows indexing the agents/directions/outcomes lists
+    """
+    slot_count = 24 * 60 // slot_minutes
+    agent_names = profile['Agent Name'].astype(str)
+    agent_calls = profile['Calls'].groupby(agent_names).sum().sort_values(ascending=False, kind='stable')
+    agents = agent_calls.index.tolist()
+    directions = sorted(profile['Communication Type'].astype(str).unique().tolist())
+    outcomes = sorted(profile['Successful ?'].astype(str).unique().tolist())
+
+    agent_index = pd.Index(agents).get_indexer(agent_names)
+    slots = profile['Slot'].to_numpy(dtype=np.intp)
+    matrix = np.zeros((len(agents), slot_count), dtype=np.int64)
+    np.add.at(matrix, (agent_index, slots), profile['Calls'].to_numpy())
+
+    cells = np.column_stack([
+        slots,
+        agent_index,
+        pd.Index(directions).get_indexer(profile['Communication Type'].astype(str)),
+        pd.Index(outcomes).get_indexer(profile['Successful ?'].astype(str)),
+        profile['Calls'].to_numpy(dtype=np.int64),
+    ])
+    cells = cells[np.lexsort((cells[:, 3], cells[:, 2], cells[:, 1], cells[:, 0]))] if len(cells) else cells
+
+    return {
+        'slot_minutes': slot_minutes,
+        'slots': slot_labels(slot_minutes),
+        'total_calls': int(matrix.sum()),
+        'slot_calls': matrix.sum(axis=0).tolist(),
+        'agents': agents,
+        'agent_calls': matrix.tolist(),
+        'direction_calls': slot_totals(profile, 'Communication Type', slot_count),
+        'outcome_calls': slot_totals(profile, 'Successful ?', slot_count),
+        'directions': directions,
+        'outcomes': outcomes,
+        'cell_columns': ['slot', 'agent', 'direction', 'outcome', 'calls'],
+        'cells': cells.tolist(),
+    }
+
+
+def intraday_json(profile, report_date, scope, slot_minutes=INTRADAY_SLOT_MINUTES):
+    """The JSON document of one scope's (all products or one product) profile"""
+    return {
+        'format_version': INTRADAY_FORMAT_VERSION,
+        'report_date': report_date,
+        'scope': scope,
+        **profile_matrix(profile, slot_minutes),
+    }
+
+
+def write_intraday_json(path, profile, report_date, scope, slot_minutes=INTRADAY_SLOT_MINUTES):
+    """Write the compact JSON heatmap matrix of a profile"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(intraday_json(profile, report_date, scope, slot_minutes), f, separators=(',', ':'))
+    return path
+
+
+def intraday_heatmap_spec(profile, scope, report_date, path, slot_minutes=INTRADAY_SLOT_MINUTES,
+                          max_agents=HEATMAP_MAX_AGENTS):
+    """Chart spec of the heatmap image: all agents, then the busiest agents, by slot"""
+    matrix = profile_matrix(profile, slot_minutes)
+    rows = [matrix['slot_calls']] + matrix['agent_calls'][:max_agents]
+    labels = [ALL_AGENTS_LABEL] + matrix['agents'][:max_agents]
+    title = f"Calls by {'Hour' if slot_minutes == 60 else f'{slot_minutes} Minutes'} - {scope} - {report_date}"
+    return heatmap_spec(rows, labels, matrix['slots'], title, path, scale_from_row=1)
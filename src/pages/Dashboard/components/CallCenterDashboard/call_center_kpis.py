@@ -0,0 +1,431 @@
+"""
+Call Center KPI Bundle
+One call metrics bundle behind every report format:
+1. The calls are grouped once into a small summary table
+   (caller x callee x direction x status x outcome x call note -> calls);
+   the customer's phone number is left out, so it has about one row per
+   agent and call outcome rather than one per call
+2. Every count, split and average KPI of a call subset (all products or
+   one product) is a sum over rows of that table, so product bundles come
+   from slices of it
+3. Distinct-number KPIs count the numbers of the (caller, callee) pairs, or
+   estimate them from mergeable sketches (see call_center_sketch), and
+   callback KPIs match call times, so both read call-level rows
+4. The text, HTML, JSON and Excel outputs all render from the bundle
+"""
+
+import html
+import json
+
+import numpy as np
+import pandas as pd
+
+from call_center_callbacks import CALLBACK_WINDOW, callback_latency, callback_latency_summary, latency_sentence
+from call_center_metrics import AGENT_CALL_THRESHOLD, agents_meeting_threshold
+from call_center_processing import FAILURE_LABEL, SUCCESS_LABEL
+from call_center_products import partition_by_product
+from call_center_sketch import (
+    NUMBER_KPIS,
+    REGISTERS_COLUMN,
+    SKETCH_PRECISION,
+    direction_sketches,
+    grouped_sketches,
+    sketch_estimate,
+    sketch_to_json,
+)
+
+# ============================================================================
+# STEP 1: BUNDLE SETTINGS
+# ============================================================================
+
+# Columns the calls are grouped by; everything the KPIs filter or count on
+SUMMARY_KEYS = ['Call From', 'Call To', 'Communication Type', 'Status', 'Successful ?', 'Call Notes']
+
+DROPPED_NOTE = 'Dead Air'
+
+# Callback KPIs; None when the call rows they match were not kept (streaming)
+CALLBACK_KPIS = ['called_back_total', 'called_back_pct', 'inbound_called_back', 'called_back_pct_inbound',
+                 'inbound_callbacks']
+
+# Customer phone numbers (left out of the summary); agent names never match
+PHONE_NUMBER_PATTERN = r'^\+?[\d\s\-()]+$'
+
+# Distinct numbers: 'exact' (nunique) or 'sketch' (HyperLogLog estimates)
+DISTINCT_NUMBER_MODES = ('exact', 'sketch')
+
+# Columns a contact sketch table is keyed by, and the customer side per direction
+CONTACT_KEYS = ['Communication Type', 'Call From', 'Call To']
+CUSTOMER_COLUMNS = {'Outbound': 'Call To', 'Inbound': 'Call From'}
+
+# The main report shows percentages with one decimal, product reports without
+TEXT_STYLES = {
+    'main': {'percent': '.1%', 'chart_end': '.'},
+    'product': {'percent': '.0%', 'chart_end': ':'},
+}
+
+# KPIs listed in the HTML and JSON outputs: (key, label, kind)
+KPI_FIELDS = [
+    ('total_calls', 'Total Calls', 'count'),
+    ('successful_calls', 'Successful Calls', 'count'),
+    ('unsuccessful_calls', 'Unsuccessful Calls', 'count'),
+    ('distinct_called_numbers', 'Unique Numbers Called', 'count'),
+    ('distinct_calling_numbers', 'Unique Numbers Calling In', 'count'),
+    ('outbound_total', 'Outbound Calls', 'count'),
+    ('outbound_agents', 'Outbound Agents', 'count'),
+    ('avg_outbound_calls', 'Average Outbound Calls per Agent', 'number'),
+    ('inbound_total', 'Inbound Calls', 'count'),
+    ('inbound_agents', 'Inbound Agents', 'count'),
+    ('avg_inbound_calls', 'Average Inbound Calls per Agent', 'number'),
+    ('inbound_successful_pct', 'Inbound Success Rate', 'percent'),
+    ('inbound_called_back', 'Unsuccessful Inbound Calls Called Back', 'count'),
+    ('called_back_pct_inbound', 'Inbound Callback Rate', 'percent'),
+    ('dropped_total', 'Dropped Calls', 'count'),
+    ('called_back_pct', 'Dropped Callback Rate', 'percent'),
+    ('total_agents', 'Agents', 'count'),
+    ('threshold_agents', 'Agents at the Successful Calls Threshold', 'count'),
+]
+
+
+def share(part, whole):
+    """part / whole, or 0 when whole is 0"""
+    return part / whole if whole else 0
+
+# ============================================================================
+# STEP 2: SUMMARY TABLE
+# ============================================================================
+
+def mask_phone_numbers(values, rows):
+    """values with the phone numbers in the given rows replaced by missing"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        is_number = np.append(categories.astype(str).str.match(PHONE_NUMBER_PATTERN), False)
+        codes = values.cat.codes.to_numpy()
+        codes = np.where(rows & is_number[codes], -1, codes)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=values.index)
+
+    is_number = values.astype(str).str.match(PHONE_NUMBER_PATTERN).to_numpy()
+    return values.where(~(rows & is_number))
+
+
+def call_summary(df, keys=SUMMARY_KEYS):
+    """
+    Group the calls once: one row per caller, callee, direction, status,
+    outcome and note. The customer side of inbound and outbound calls is
+    left out when it is a phone number; agents are always kept.
+    """
+    direction = df['Communication Type']
+    columns = {key: df[key] for key in keys}
+    columns['Call From'] = mask_phone_numbers(df['Call From'], (direction == 'Inbound').to_numpy())
+    columns['Call To'] = mask_phone_numbers(df['Call To'], (direction == 'Outbound').to_numpy())
+
+    summary = pd.DataFrame(columns).groupby(keys, observed=True, dropna=False, sort=False).size()
+    return summary.rename('Calls').reset_index()
+
+
+def summary_partitions(summary, agents_df):
+    """{product: summary row positions}, using the same product rule as the call rows"""
+    return partition_by_product(summary, agents_df.set_index('Agent Name')['Product'])
+
+# ============================================================================
+# STEP 3: KPIS
+# ============================================================================
+
+def summed_counts(calls, values):
+    """value_counts() of pre-aggregated rows: most calls first, ties in category order"""
+    counts = calls.groupby(values, observed=False).sum()
+    return counts[counts > 0].sort_values(ascending=False, kind='stable').rename('count')
+
+
+def call_kpis(summary, excluded_agents=()):
+    """Call counts, success splits and per-agent averages from a summary table"""
+    excluded_agents = list(excluded_agents)
+    calls = summary['Calls']
+    direction = summary['Communication Type']
+    successful = (summary['Successful ?'] == SUCCESS_LABEL).to_numpy()
+    unsuccessful = (summary['Successful ?'] == FAILURE_LABEL).to_numpy()
+    all_outbound = (direction == 'Outbound').to_numpy()
+    all_inbound = (direction == 'Inbound').to_numpy()
+
+    # Agent averages and inbound splits leave out the excluded agents
+    outbound = all_outbound & ~summary['Call From'].isin(excluded_agents).to_numpy()
+    inbound = all_inbound & ~summary['Call To'].isin(excluded_agents).to_numpy()
+
+    note_counts = summed_counts(calls, summary['Call Notes'])
+
+    total_calls = int(calls.sum())
+    outbound_total = int(calls[outbound].sum())
+    outbound_agents = summary.loc[outbound, 'Call From'].nunique()
+    inbound_total = int(calls[inbound].sum())
+    inbound_agents = summary.loc[inbound, 'Call To'].nunique()
+    inbound_successful = int(calls[inbound & successful].sum())
+    inbound_unsuccessful = int(calls[inbound & unsuccessful].sum())
+    dropped_total = int(calls[(summary['Call Notes'] == DROPPED_NOTE).to_numpy()].sum())
+
+    return {
+        'total_calls': total_calls,
+        'communication_counts': calls.groupby(direction, observed=True).sum().sort_values(ascending=False),
+        'successful_calls': int(calls[successful].sum()),
+        'unsuccessful_calls': int(calls[unsuccessful].sum()),
+        'note_counts': note_counts,
+        'status_counts': summed_counts(calls, summary['Status']),
+        'dropped_total': dropped_total,
+        'dropped_pct': share(dropped_total, total_calls),
+        'outbound_total': outbound_total,
+        'outbound_agents': outbound_agents,
+        'avg_outbound_calls': round(outbound_total / outbound_agents, 2) if outbound_agents else 0,
+        'inbound_total': inbound_total,
+        'inbound_agents': inbound_agents,
+        'inbound_successful': inbound_successful,
+        'inbound_unsuccessful': inbound_unsuccessful,
+        'inbound_successful_pct': share(inbound_successful, inbound_total),
+        'inbound_unsuccessful_pct': share(inbound_unsuccessful, inbound_total),
+        'avg_inbound_calls': round(inbound_total / inbound_agents, 2) if inbound_agents else 0,
+    }
+
+
+def contact_sketches(contacts, keys=CONTACT_KEYS, precision=SKETCH_PRECISION):
+    """
+    Reduce inbound and outbound call rows to sketches of the customer numbers,
+    one per key row. The customer side is masked like call_summary(), so the
+    table has about one row per agent and direction and slices by product.
+    """
+    direction = contacts['Communication Type']
+    tables = []
+    for kind_direction, customer_column in CUSTOMER_COLUMNS.items():
+        rows = (direction == kind_direction).to_numpy()
+        key_rows = pd.DataFrame({key: contacts[key] for key in keys})[rows]
+        key_rows[customer_column] = mask_phone_numbers(key_rows[customer_column], np.ones(len(key_rows), dtype=bool))
+        tables.append(grouped_sketches(key_rows, contacts.loc[rows, customer_column], precision))
+    return pd.concat(tables, ignore_index=True)
+
+
+def number_kpis(contacts, mode='exact', precision=SKETCH_PRECISION):
+    """
+    Unique phone numbers called (outbound) and calling in (inbound), from
+    call rows or deduplicated (direction, caller, callee) rows. In 'sketch'
+    mode, or given a contact sketch table, they are estimated and the
+    merged sketches are kept for the JSON output.
+    """
+    if mode not in DISTINCT_NUMBER_MODES:
+        raise ValueError(f"Unknown distinct number mode: {mode}")
+
+    if mode == 'sketch' or REGISTERS_COLUMN in contacts:
+        if REGISTERS_COLUMN not in contacts:
+            contacts = contact_sketches(contacts, precision=precision)
+        sketches = direction_sketches(contacts, precision)
+        return {
+            **{NUMBER_KPIS[kind]: sketch_estimate(sketch) for kind, sketch in sketches.items()},
+            'number_sketches': sketches,
+        }
+
+    direction = contacts['Communication Type']
+    return {
+        'distinct_called_numbers': contacts.loc[direction == 'Outbound', 'Call To'].nunique(),
+        'distinct_calling_numbers': contacts.loc[direction == 'Inbound', 'Call From'].nunique(),
+        'number_sketches': None,
+    }
+
+
+def callback_kpis(df, excluded_agents=(), window=CALLBACK_WINDOW):
+    """Callback KPIs of a call subset; these need call times, so they read the call rows"""
+    excluded_agents = list(excluded_agents)
+    direction = df['Communication Type']
+    all_outbound = df[direction == 'Outbound']
+    outbound = all_outbound[~all_outbound['Call From'].isin(excluded_agents)]
+    inbound = df[direction == 'Inbound']
+    inbound = inbound[~inbound['Call To'].isin(excluded_agents)]
+
+    # A dropped call counts as called back when the customer's number gets an
+    # outbound call after it, within the window
+    dropped = df[df['Call Notes'] == DROPPED_NOTE]
+    dropped_direction = dropped['Communication Type']
+    inbound_called_back = callback_latency(dropped[dropped_direction == 'Inbound'], all_outbound, 'Call From',
+                                           window=window).notna()
+    outbound_called_back = callback_latency(dropped[dropped_direction == 'Outbound'], all_outbound, 'Call To',
+                                            window=window).notna()
+    called_back_total = int(inbound_called_back.sum() + outbound_called_back.sum())
+
+    # Unsuccessful inbound calls: the first later outbound call to the caller
+    inbound_callbacks = callback_latency_summary(
+        callback_latency(inbound[inbound['Successful ?'] == FAILURE_LABEL], outbound, window=window))
+
+    return {
+        'called_back_total': called_back_total,
+        'called_back_pct': share(called_back_total, len(dropped)),
+        'inbound_called_back': inbound_callbacks['called_back'],
+        'called_back_pct_inbound': inbound_callbacks['called_back_pct'],
+        'inbound_callbacks': inbound_callbacks,
+    }
+
+
+def agent_kpis(agents_df, agent_outcomes, threshold=AGENT_CALL_THRESHOLD, agents=None):
+    """Agent counts and "threshold or more calls" highlights, optionally for some agents only"""
+    return {
+        'total_agents': agents_df['Agent Name'].nunique(),
+        'threshold_agents': int((agents_df['Successful Calls'] >= threshold).sum()),
+        'outbound_successful_threshold': agents_meeting_threshold(agent_outcomes, 'Outbound', SUCCESS_LABEL,
+                                                                  threshold, agents),
+        'outbound_unsuccessful_threshold': agents_meeting_threshold(agent_outcomes, 'Outbound', FAILURE_LABEL,
+                                                                    threshold, agents),
+        'agent_call_threshold': threshold,
+    }
+
+
+def metrics_bundle(summary, calls, agents_df, agent_outcomes, scope, config, agents=None, contacts=None):
+    """
+    Build the metrics bundle of one call subset: its summary table rows,
+    the call rows (for callbacks and, unless contacts is given, distinct
+    numbers) and its agents. The bundle keeps the summary so Excel sheets
+    can be rendered from it. With calls None (and contacts given) the
+    callback KPIs are None.
+    """
+    return {
+        'scope': scope,
+        'summary': summary,
+        **call_kpis(summary, config['excluded_agents']),
+        **number_kpis(calls if contacts is None else contacts, config.get('distinct_numbers', 'exact'),
+                      config.get('sketch_precision', SKETCH_PRECISION)),
+        **(callback_kpis(calls, config['excluded_agents'], config['callback_window']) if calls is not None
+           else dict.fromkeys(CALLBACK_KPIS)),
+        **agent_kpis(agents_df, agent_outcomes, config['agent_call_threshold'], agents),
+    }
+
+# ============================================================================
+# STEP 4: TEXT AND HTML
+# ============================================================================
+
+def metrics_text(metrics, report_date, style='product'):
+    """The emailed summary report of a bundle ('main' or 'product' style)"""
+    pct = TEXT_STYLES[style]['percent']
+    total_calls = metrics['total_calls']
+    counts = metrics['communication_counts']
+    inbound, outbound, internal = (int(counts.get(direction, 0)) for direction in ('Inbound', 'Outbound', 'Internal'))
+    total_agents = metrics['total_agents']
+    outbound_agents = metrics['outbound_agents']
+    threshold = metrics['agent_call_threshold']
+
+    lines = [
+        f"Hi,\nBelow is the call center summary report for {report_date}:\n\n",
+        "CALLS SUMMARY REPORT\n\n",
+        f"- Total calls made for the day were {total_calls}, with {metrics['distinct_called_numbers']} unique phone numbers being called (outbound) and {metrics['distinct_calling_numbers']} unique phone numbers that called in (inbound).\n",
+        f"- Out of the total {total_calls} calls, {inbound} ({share(inbound, total_calls):{pct}}) were inbound calls, ",
+        f"{outbound} ({share(outbound, total_calls):{pct}}) were outbound calls and ",
+        f"{internal} ({share(internal, total_calls):{pct}}) were internal calls.\n",
+        f"- Out of the total {total_calls} calls, {metrics['successful_calls']} ({share(metrics['successful_calls'], total_calls):{pct}}) were successful and {metrics['unsuccessful_calls']} ({share(metrics['unsuccessful_calls'], total_calls):{pct}}) were unsuccessful.\n",
+        f"- Of the total {total_calls} calls made for the day the distribution of the calls disposition is visualized in the chart{TEXT_STYLES[style]['chart_end']}\n\n",
+
+        "AGENTS PERFORMANCE HIGHLIGHTS\n\n",
+        f"Day Performance Summary : - Of the total {total_agents} agents who made calls, {metrics['threshold_agents']} ({share(metrics['threshold_agents'], total_agents):{pct}}) had {threshold} or more successful calls for the day (Both inbound & outbound).\n\n",
+
+        "For Outbound calls:\n",
+        f"- Average outbound calls made per agent was {metrics['avg_outbound_calls']}\n",
+        f"- Of the total {outbound_agents} agents who made outbound calls, {metrics['outbound_successful_threshold']} ({share(metrics['outbound_successful_threshold'], outbound_agents):{pct}}) Agents had {threshold} or more successful outbound calls for the day.\n",
+        f"- {metrics['outbound_unsuccessful_threshold']} ({share(metrics['outbound_unsuccessful_threshold'], outbound_agents):{pct}}) Agents had {threshold} or more unsuccessful outbound calls for the day.\n\n",
+    ]
+
+    if metrics['inbound_total']:
+        lines += [
+            "For Inbound Calls:\n",
+            f"- Average inbound calls received per agent was {metrics['avg_inbound_calls']}\n",
+            f"- Of the total {metrics['inbound_total']} inbound calls, {metrics['inbound_successful']} ({metrics['inbound_successful_pct']:{pct}}) were successful and {metrics['inbound_unsuccessful']} ({metrics['inbound_unsuccessful_pct']:{pct}}) were unsuccessful.\n",
+        ]
+        if metrics['inbound_callbacks'] is not None:
+            lines += [
+                f"- Of the {metrics['inbound_unsuccessful']} unsuccessful inbound calls, {metrics['inbound_called_back']} ({metrics['called_back_pct_inbound']:{pct}}) were called back.\n",
+                latency_sentence(metrics['inbound_callbacks']),
+            ]
+        lines.append("\n")
+    else:
+        lines.append("No inbound calls recorded for the day.\n\n")
+
+    return ''.join(lines)
+
+
+def format_kpi(value, kind):
+    """Display text of one KPI value ('n/a' when it was not computed)"""
+    if value is None:
+        return "n/a"
+    if kind == 'percent':
+        return f"{value:.1%}"
+    if kind == 'number':
+        return f"{value:,.2f}"
+    return f"{value:,}"
+
+
+def metrics_html(metrics, report_date):
+    """A standalone HTML page with the KPI table and the call notes breakdown of a bundle"""
+    kpi_rows = ''.join(f"<tr><td>{html.escape(label)}</td><td style=\"text-align: right;\">"
+                       f"{format_kpi(metrics[key], kind)}</td></tr>\n"
+                       for key, label, kind in KPI_FIELDS)
+    note_rows = ''.join(f"<tr><td>{html.escape(str(note))}</td><td style=\"text-align: right;\">{count:,}</td>"
+                        f"<td style=\"text-align: right;\">{share(count, metrics['total_calls']):.2%}</td></tr>\n"
+                        for note, count in metrics['note_counts'].items())
+    title = html.escape(f"Call Center KPIs - {metrics['scope']} - {report_date}")
+
+    return (f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>{title}</title></head>\n"
+            f"<body style=\"font-family: Arial, sans-serif;\">\n<h2>{title}</h2>\n"
+            f"<table border=\"1\" cellpadding=\"6\" style=\"border-collapse: collapse;\">\n"
+            f"<tr><th>KPI</th><th>Value</th></tr>\n{kpi_rows}</table>\n"
+            f"<h3>Call Notes</h3>\n"
+            f"<table border=\"1\" cellpadding=\"6\" style=\"border-collapse: collapse;\">\n"
+            f"<tr><th>Call Notes</th><th>Calls</th><th>Percentage</th></tr>\n{note_rows}</table>\n"
+            f"</body>\n</html>\n")
+
+# ============================================================================
+# STEP 5: JSON AND EXCEL
+# ============================================================================
+
+def metrics_json(metrics, report_date):
+    """
+    The bundle as plain JSON-ready values (the summary table is left out).
+    In sketch mode the distinct-number sketches are included, so files of
+    several days or products can be merged later.
+    """
+    data = {
+        'report_date': report_date,
+        'scope': metrics['scope'],
+        'kpis': {key: metrics[key] for key, _, _ in KPI_FIELDS},
+        'communication_counts': {str(k): int(v) for k, v in metrics['communication_counts'].items()},
+        'note_counts': {str(k): int(v) for k, v in metrics['note_counts'].items()},
+        'status_counts': {str(k): int(v) for k, v in metrics['status_counts'].items()},
+        'inbound_callbacks': metrics['inbound_callbacks'],
+        'agent_call_threshold': metrics['agent_call_threshold'],
+        'outbound_successful_threshold': metrics['outbound_successful_threshold'],
+        'outbound_unsuccessful_threshold': metrics['outbound_unsuccessful_threshold'],
+    }
+    if metrics.get('number_sketches') is not None:
+        data['number_sketches'] = {kind: sketch_to_json(sketch) for kind, sketch in metrics['number_sketches'].items()}
+    return data
+
+
+def write_metrics_json(path, metrics, report_date):
+    """Write the JSON rendering of a bundle"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metrics_json(metrics, report_date), f, indent=2)
+    return path
+
+
+def direction_frame(metrics, agent_column, direction, excluded_agents=()):
+    """
+    Per-agent totals, successes and success rate for one direction, from the
+    bundle's summary table: indexed by agent_column, with Total_<direction>,
+    Successful_<direction> and <direction>_Success_Rate (in percent) columns
+    """
+    summary = metrics['summary']
+    rows = summary[(summary['Communication Type'] == direction)
+                   & ~summary[agent_column].isin(list(excluded_agents))]
+    successful_calls = rows['Calls'].where(rows['Successful ?'] == SUCCESS_LABEL, 0)
+
+    frame = pd.DataFrame({f'Total_{direction}': rows['Calls'], f'Successful_{direction}': successful_calls})
+    frame = frame.groupby(rows[agent_column], observed=True).sum()
+    # Agents are categories in order of appearance; list them by name
+    frame = frame.sort_index(key=lambda agents: agents.astype(str))
+    frame[f'{direction}_Success_Rate'] = frame[f'Successful_{direction}'] / frame[f'Total_{direction}'] * 100
+    return frame
+
+
+def notes_frame(metrics):
+    """Call notes counts and shares of a bundle as an Excel table"""
+    notes = metrics['note_counts'].rename_axis('Call_Notes').rename('Count').reset_index()
+    notes['Percentage'] = (notes['Count'] / metrics['total_calls']).apply(lambda x: f"{x:.2%}")
+    return notes
@@ -0,0 +1,171 @@
+"""
+Call Center Run Ledger
+Remembers what each report run was built from, so reruns can skip work:
+1. Every exporting run appends one JSON line to NEW_FILES/run_ledger.jsonl
+   with the SHA-256 of its input files (CDR exports, master workbook and
+   agent alias table), of the call_center_*.py modules that hold the rules,
+   and of the settings that shape the reports, plus the report dates, the
+   files it wrote and the product emails it did not get out
+2. A rerun with the same inputs, code and settings whose files all still exist is
+   "already done"; if some of its emails failed (or were never sent), only
+   those are sent
+3. config['force_rebuild'] (--force on the command line) always rebuilds
+This lets a scheduler retry the job after a transient email failure without
+rebuilding every chart and workbook.
+"""
+
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from call_center_processing import AGENT_ALIASES_FILE
+from call_center_products import file_sha256
+
+# ============================================================================
+# STEP 1: LEDGER SETTINGS
+# ============================================================================
+
+LEDGER_NAME = 'run_ledger.jsonl'
+
+# Settings that change how a run goes, not what it writes; they are left out
+# of the config hash. Input paths are covered by the content hashes instead.
+RUN_ONLY_KEYS = ['run_id', 'cdr_file', 'master_cdr_file', 'folder_path', 'reuse_cdr_snapshot', 'chart_cache_dir',
+                 'chart_workers', 'excel_workers', 'stage_log', 'profile_stages', 'profiler', 'run_ledger',
+                 'force_rebuild']
+
+# Pipeline modules; name matching, KPI rules and report layouts live in code,
+# so a change to any of them rebuilds instead of reusing an old run
+PIPELINE_SOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'call_center_*.py')
+
+# 'built': reports written, some emails not (yet) sent; 'sent': every email out
+BUILT = 'built'
+SENT = 'sent'
+
+# ============================================================================
+# STEP 2: FINGERPRINTS
+# ============================================================================
+
+def input_files(config, aliases_file=AGENT_ALIASES_FILE):
+    """The CDR export(s), master workbook and agent alias table (when present) a run reads"""
+    cdr_files = config['cdr_file'] if isinstance(config['cdr_file'], (list, tuple)) else [config['cdr_file']]
+    if not os.path.exists(aliases_file):
+        aliases_file = None
+    return [path for path in [*cdr_files, config.get('master_cdr_file'), aliases_file] if path]
+
+
+def sources_hash(pattern=PIPELINE_SOURCES):
+    """SHA-256 of the pipeline modules' code"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(pattern)):
+        digest.update(f"{os.path.basename(path)}:{file_sha256(path)}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def config_hash(config, ignored=RUN_ONLY_KEYS):
+    """SHA-256 of the settings that shape the reports"""
+    settings = {key: value for key, value in config.items() if key not in ignored}
+    payload = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def run_fingerprint(config):
+    """
+    {'input_hash', 'inputs', 'sources_hash', 'config_hash'} of a run;
+    input_hash covers every input file's content
+    """
+    inputs = {os.path.basename(path): file_sha256(path) for path in input_files(config)}
+    input_hash = hashlib.sha256(json.dumps(sorted(inputs.values())).encode('utf-8')).hexdigest()
+    return {'input_hash': input_hash, 'inputs': inputs, 'sources_hash': sources_hash(),
+            'config_hash': config_hash(config)}
+
+# ============================================================================
+# STEP 3: READING AND WRITING
+# ============================================================================
+
+def read_ledger(ledger_path):
+    """Every record of the ledger, oldest first; unreadable lines are skipped"""
+    if not ledger_path or not os.path.exists(ledger_path):
+        return []
+
+    records = []
+    with open(ledger_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def missing_artifacts(record):
+    """Files a ledger record lists that are no longer there"""
+    return [path for path in record.get('artifacts', []) if not os.path.exists(path)]
+
+
+def find_run(ledger_path, fingerprint):
+    """
+    The latest run with the same input, source and config hashes whose files
+    all still exist, or None
+    """
+    for record in reversed(read_ledger(ledger_path)):
+        if all(record.get(key) == fingerprint[key] for key in ['input_hash', 'sources_hash', 'config_hash']):
+            return None if missing_artifacts(record) else record
+    return None
+
+
+def record_run(ledger_path, fingerprint, run_id, report_dates, artifacts, unsent, rows=None, resent=False):
+    """
+    Append one run to the ledger and return its record. unsent maps each
+    report date with outstanding emails to their products (None for all).
+    """
+    record = {
+        'run_id': run_id,
+        'finished': datetime.now().isoformat(timespec='seconds'),
+        **fingerprint,
+        'report_dates': sorted(report_dates),
+        'rows': rows,
+        'artifacts': sorted(artifacts),
+        'unsent': dict(sorted(unsent.items())),
+        'status': BUILT if unsent else SENT,
+        'resent': resent,
+    }
+    os.makedirs(os.path.dirname(ledger_path) or '.', exist_ok=True)
+    with open(ledger_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+    return record
+
+# ============================================================================
+# STEP 4: RUN ARTIFACTS
+# ============================================================================
+
+def day_unsent(day_result, products=None):
+    """
+    Products of a reported day whose email did not go out: the failed ones,
+    or every product tried (products, None for all) when none were sent
+    """
+    email_results = day_result.get('email_results')
+    if email_results is None:
+        return products
+    return [product for product, sent in email_results.items() if sent is False]
+
+
+def run_unsent(days, tried=None):
+    """
+    {report date: unsent products} of day results, for the days with
+    outstanding emails; tried maps dates to the products emailed (default all)
+    """
+    tried = tried or {}
+    unsent = {report_date: day_unsent(day_result, tried.get(report_date)) for report_date, day_result in days.items()}
+    return {report_date: products for report_date, products in unsent.items() if products is None or products}
+
+
+def day_artifacts(day_result):
+    """Files in a reported day's output folders"""
+    artifacts = []
+    for directory in day_result.get('output_dirs', {}).values():
+        if os.path.isdir(directory):
+            artifacts += [os.path.join(directory, name) for name in os.listdir(directory)
+                          if os.path.isfile(os.path.join(directory, name))]
+    return artifacts
@@ -0,0 +1,271 @@
+"""
+Call Center CDR Loader
+Reads a pse-cdr CSV export with:
+1. Only the columns the report keeps (unused columns are never parsed)
+2. Dtypes declared up front (categoricals, nullable ints, text)
+3. The pyarrow CSV engine when it is installed
+4. Load time and peak memory reporting
+5. A compressed Parquet snapshot that reruns load instead of the CSV
+6. Splitting exports that span several days into per-day row positions
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    pa = None
+    pq = None
+    CSV_ENGINE = 'c'
+
+# ============================================================================
+# STEP 1: CDR SCHEMA
+# ============================================================================
+
+# Columns the report never uses; they are skipped while parsing
+DROPPED_CDR_COLUMNS = ['DID', 'DOD', 'Caller IP Address', 'PIN Code', 'Recording File', 'Reason']
+
+CDR_DTYPES = {
+    'Status': 'category',
+    'Communication Type': 'category',
+    'Talk Duration': 'Int64',
+    'Call From': str,
+    'Call To': str,
+    'Call Notes': str,
+}
+
+# Format of the 'Time' column, e.g. '11/27/2025 06:19:41 AM'
+CDR_TIME_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+# Snapshots live in this sub-folder of the CDR folder
+SNAPSHOT_DIR_NAME = 'snapshots'
+SNAPSHOT_COMPRESSION = 'zstd'
+
+# The declared dtypes and time format are stored with each snapshot; bump
+# this when other loader code (e.g. parse_cdr_time) changes its output so
+# older snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+SNAPSHOT_METADATA_KEY = b'cdr_snapshot'
+
+# ============================================================================
+# STEP 2: MEMORY REPORTING
+# ============================================================================
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB, or None if it cannot be read.
+    Uses the resource module on Unix and psutil (if installed) on Windows.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return round(peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024, 1)
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / 1024 ** 2, 1)
+    except ImportError:
+        return None
+
+# ============================================================================
+# STEP 3: CDR LOADING
+# ============================================================================
+
+def read_cdr_header(cdr_file):
+    """Return the column names of a CDR export without reading any rows"""
+    return pd.read_csv(cdr_file, nrows=0).columns.tolist()
+
+
+def cdr_read_options(columns, dropped_columns=DROPPED_CDR_COLUMNS, dtypes=CDR_DTYPES):
+    """Build the usecols/dtype arguments for the columns present in a file"""
+    usecols = [column for column in columns if column not in dropped_columns]
+    dtype = {column: kind for column, kind in dtypes.items() if column in usecols}
+    return usecols, dtype
+
+
+def parse_cdr_time(time_series, time_format=CDR_TIME_FORMAT):
+    """Parse the 'Time' column with the known CDR format; bad values become NaT"""
+    return pd.to_datetime(time_series, format=time_format, errors='coerce')
+
+
+def load_cdr(cdr_file, engine=None, dropped_columns=DROPPED_CDR_COLUMNS, dtypes=CDR_DTYPES,
+             parse_time=True):
+    """
+    Load a CDR CSV with pruned columns and declared dtypes.
+    Returns (df, load_stats) where load_stats holds rows, seconds and memory figures.
+    """
+    engine = engine or CSV_ENGINE
+    usecols, dtype = cdr_read_options(read_cdr_header(cdr_file), dropped_columns, dtypes)
+    start = time.perf_counter()
+
+    try:
+        df = pd.read_csv(cdr_file, engine=engine, usecols=usecols, dtype=dtype)
+    except (ValueError, TypeError) as e:
+        # A column that does not fit its declared dtype (e.g. a text
+        # Talk Duration) is read untyped instead of failing the run
+        print(f"⚠️ Typed CDR load failed ({e}), retrying without dtypes")
+        df = pd.read_csv(cdr_file, engine=engine, usecols=usecols)
+
+    if parse_time and 'Time' in df.columns:
+        df['Time'] = parse_cdr_time(df['Time'])
+
+    load_stats = {
+        'file': cdr_file,
+        'engine': engine,
+        'rows': len(df),
+        'columns': len(df.columns),
+        'seconds': round(time.perf_counter() - start, 3),
+        'frame_mb': round(df.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    return df, load_stats
+
+
+def split_cdr_by_day(time_series, default_date):
+    """
+    Group calls by calendar day in one pass.
+
+    Returns {'YYYY-MM-DD': row positions} in date order, each day's rows in
+    file order. Rows whose time is missing go to default_date, which is
+    also returned (with no rows) for an empty export.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(time_series):
+        time_series = parse_cdr_time(time_series)
+
+    day_codes, days = pd.factorize(time_series.dt.normalize(), sort=True)
+    labels = list(days.strftime('%Y-%m-%d'))
+
+    missing = day_codes == -1
+    if missing.any() or not labels:
+        if default_date not in labels:
+            labels.append(default_date)
+        day_codes = np.where(missing, labels.index(default_date), day_codes)
+
+    # A stable sort keeps file order inside each day
+    order = np.argsort(day_codes, kind='stable')
+    bounds = np.searchsorted(day_codes[order], np.arange(len(labels) + 1))
+    return {label: order[bounds[code]:bounds[code + 1]]
+            for code, label in sorted(enumerate(labels), key=lambda item: item[1])}
+
+
+def print_load_stats(load_stats):
+    """Print a one-line summary of a CDR load"""
+    peak = f", peak RSS {load_stats['peak_rss_mb']} MB" if load_stats.get('peak_rss_mb') else ""
+    print(f"✓ Loaded {load_stats['rows']:,} rows x {load_stats['columns']} columns "
+          f"in {load_stats['seconds']}s ({load_stats['engine']} engine, "
+          f"{load_stats['frame_mb']} MB in memory{peak})")
+
+# ============================================================================
+# STEP 4: PARQUET SNAPSHOTS
+# ============================================================================
+
+def snapshot_path(cdr_file, snapshot_dir=None):
+    """Return the snapshot location for a CDR file"""
+    if snapshot_dir is None:
+        snapshot_dir = os.path.join(os.path.dirname(cdr_file), SNAPSHOT_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(cdr_file))[0]
+    return os.path.join(snapshot_dir, f"{stem}.parquet")
+
+
+def snapshot_format(dtypes=CDR_DTYPES, parse_time=True):
+    """The loader settings that shape a snapshot's columns: version, declared dtypes and 'Time' parsing"""
+    return {
+        'version': SNAPSHOT_VERSION,
+        'dtypes': {column: getattr(kind, '__name__', str(kind)) for column, kind in sorted(dtypes.items())},
+        'time_format': CDR_TIME_FORMAT if parse_time else None,
+    }
+
+
+def snapshot_source_info(cdr_file, dropped_columns=DROPPED_CDR_COLUMNS, dtypes=CDR_DTYPES, parse_time=True):
+    """Describe a CDR file and loader settings; a snapshot is valid while this matches"""
+    stat = os.stat(cdr_file)
+    return {
+        'format': snapshot_format(dtypes, parse_time),
+        'source': os.path.basename(cdr_file),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'dropped_columns': sorted(dropped_columns),
+    }
+
+
+def write_snapshot(df, cdr_file, snapshot_file, dropped_columns=DROPPED_CDR_COLUMNS, dtypes=CDR_DTYPES,
+                   parse_time=True):
+    """Write the loaded CDR as compressed Parquet, tagged with its source file and loader format"""
+    if pq is None:
+        print("⚠️ pyarrow not installed, skipping CDR snapshot")
+        return None
+
+    os.makedirs(os.path.dirname(snapshot_file), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    source_info = snapshot_source_info(cdr_file, dropped_columns, dtypes, parse_time)
+    metadata[SNAPSHOT_METADATA_KEY] = json.dumps(source_info).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # Write to a temporary file first so an interrupted run never leaves
+    # a half-written snapshot behind
+    temp_file = f"{snapshot_file}.tmp"
+    pq.write_table(table, temp_file, compression=SNAPSHOT_COMPRESSION)
+    os.replace(temp_file, snapshot_file)
+    return snapshot_file
+
+
+def read_snapshot(cdr_file, snapshot_file, dropped_columns=DROPPED_CDR_COLUMNS, dtypes=CDR_DTYPES,
+                  parse_time=True):
+    """Return the snapshot DataFrame, or None if it is missing, out of date or of another format"""
+    if pq is None or not os.path.exists(snapshot_file):
+        return None
+
+    try:
+        metadata = pq.read_schema(snapshot_file).metadata or {}
+        stored_info = json.loads(metadata.get(SNAPSHOT_METADATA_KEY, b'{}'))
+        if stored_info != snapshot_source_info(cdr_file, dropped_columns, dtypes, parse_time):
+            return None
+        return pq.read_table(snapshot_file).to_pandas()
+    except Exception as e:
+        print(f"⚠️ Could not read CDR snapshot {snapshot_file}: {e}")
+        return None
+
+
+def load_cdr_with_snapshot(cdr_file, snapshot_dir=None, reuse_snapshot=True,
+                           dropped_columns=DROPPED_CDR_COLUMNS, **load_options):
+    """
+    Load a CDR from its Parquet snapshot when one matches the CSV,
+    otherwise parse the CSV and write a fresh snapshot.
+    Returns (df, load_stats); load_stats['source'] tells which was used.
+    """
+    snapshot_file = snapshot_path(cdr_file, snapshot_dir)
+    dtypes = load_options.get('dtypes', CDR_DTYPES)
+    parse_time = load_options.get('parse_time', True)
+
+    if reuse_snapshot:
+        start = time.perf_counter()
+        df = read_snapshot(cdr_file, snapshot_file, dropped_columns, dtypes, parse_time)
+        if df is not None:
+            return df, {
+                'file': snapshot_file,
+                'engine': 'parquet',
+                'source': 'snapshot',
+                'rows': len(df),
+                'columns': len(df.columns),
+                'seconds': round(time.perf_counter() - start, 3),
+                'frame_mb': round(df.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+                'peak_rss_mb': peak_rss_mb(),
+            }
+
+    df, load_stats = load_cdr(cdr_file, dropped_columns=dropped_columns, **load_options)
+    load_stats['source'] = 'csv'
+    load_stats['snapshot'] = write_snapshot(df, cdr_file, snapshot_file, dropped_columns, dtypes, parse_time)
+    return df, load_stats
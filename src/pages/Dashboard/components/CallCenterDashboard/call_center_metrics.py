@@ -0,0 +1,143 @@
+"""
+Call Center Metrics
+Grouped aggregations used by call_center_report_copy.py:
+1. Per-agent inbound/outbound performance in a single grouped pass
+2. Per-agent outcome counts (agent x direction x outcome) for threshold metrics
+Both accept call rows or pre-aggregated rows (count_column holds the calls
+each row stands for), so streamed chunk summaries give the same tables.
+"""
+
+import numpy as np
+import pandas as pd
+
+from call_center_processing import SUCCESS_LABEL
+
+# ============================================================================
+# STEP 1: AGENT PERFORMANCE COLUMNS
+# ============================================================================
+
+AGENT_PERFORMANCE_COLUMNS = ['Agent Name', 'outbound_calls', 'inbound_calls',
+                             'Total Calls', 'Successful Calls', 'Success Rate (%)']
+
+# Columns holding numeric percentages that are formatted only for display
+RATE_COLUMNS = ['Success Rate (%)']
+
+# Default number of calls an agent needs for the "N or more calls" highlights
+AGENT_CALL_THRESHOLD = 50
+
+# ============================================================================
+# STEP 2: AGENT PERFORMANCE AGGREGATION
+# ============================================================================
+
+def agent_key(df, outbound, inbound):
+    """
+    Return the agent for every call: 'Call From' for outbound calls,
+    'Call To' for inbound calls and missing for anything else.
+    """
+    call_from, call_to = df['Call From'], df['Call To']
+
+    if (isinstance(call_from.dtype, pd.CategoricalDtype)
+            and isinstance(call_to.dtype, pd.CategoricalDtype)
+            and call_from.cat.categories.equals(call_to.cat.categories)):
+        codes = np.where(outbound, call_from.cat.codes,
+                         np.where(inbound, call_to.cat.codes, -1))
+        return pd.Categorical.from_codes(codes, categories=call_from.cat.categories)
+
+    return np.where(outbound, call_from.to_numpy(dtype=object),
+                    np.where(inbound, call_to.to_numpy(dtype=object), None))
+
+
+def row_calls(df, count_column=None):
+    """Calls each row stands for: 1, or df[count_column] for pre-aggregated rows"""
+    return 1 if count_column is None else df[count_column].to_numpy()
+
+
+def agent_performance(df, excluded_agents=(), success_column='Successful ?', count_column=None):
+    """
+    Build the per-agent performance table with one grouped sum.
+
+    Every inbound/outbound call contributes boolean indicator columns for
+    its agent, so counts and successes come from native grouped sums.
+    'Success Rate (%)' stays numeric; use format_rates() for display.
+    """
+    direction = df['Communication Type']
+    outbound = (direction == 'Outbound').to_numpy()
+    inbound = (direction == 'Inbound').to_numpy()
+    successful = (df[success_column] == SUCCESS_LABEL).to_numpy()
+    directional = outbound | inbound
+    calls = row_calls(df, count_column)
+
+    indicators = pd.DataFrame({
+        'Agent Name': agent_key(df, outbound, inbound),
+        'outbound_calls': outbound * calls,
+        'successful_outbound': (outbound & successful) * calls,
+        'inbound_calls': inbound * calls,
+        'successful_inbound': (inbound & successful) * calls,
+    })[directional]
+
+    agents = indicators.groupby('Agent Name', observed=True, sort=False).sum().reset_index()
+    # Plain strings, so later .map()/.fillna() calls are not tied to categories
+    agents['Agent Name'] = agents['Agent Name'].astype(str)
+    agents['Total Calls'] = agents['outbound_calls'] + agents['inbound_calls']
+    agents['Successful Calls'] = agents['successful_outbound'] + agents['successful_inbound']
+    agents['Success Rate (%)'] = agents['Successful Calls'] / agents['Total Calls'] * 100
+
+    agents = agents.loc[~agents['Agent Name'].isin(list(excluded_agents)), AGENT_PERFORMANCE_COLUMNS]
+    return agents.sort_values(by='Successful Calls', ascending=False)
+
+# ============================================================================
+# STEP 3: AGENT OUTCOME COUNTS
+# ============================================================================
+
+def agent_outcome_counts(df, excluded_agents=(), success_column='Successful ?', count_column=None):
+    """
+    Count calls per agent x direction x outcome, once per run.
+
+    Returns a small long-format table with 'Agent Name', 'Direction',
+    'Outcome' and 'Calls' columns. Outbound calls belong to 'Call From',
+    inbound calls to 'Call To'; internal calls are left out.
+    """
+    direction = df['Communication Type']
+    outbound = (direction == 'Outbound').to_numpy()
+    inbound = (direction == 'Inbound').to_numpy()
+    directional = outbound | inbound
+
+    calls = pd.DataFrame({
+        'Agent Name': agent_key(df, outbound, inbound),
+        'Direction': np.where(outbound, 'Outbound', 'Inbound'),
+        'Outcome': df[success_column].to_numpy(dtype=object),
+        'Calls': np.broadcast_to(row_calls(df, count_column), len(df)),
+    })[directional]
+
+    counts = calls.groupby(['Agent Name', 'Direction', 'Outcome'], observed=True)['Calls'].sum()
+    counts = counts.reset_index()
+    counts['Agent Name'] = counts['Agent Name'].astype(str)
+    return counts[~counts['Agent Name'].isin(list(excluded_agents))].reset_index(drop=True)
+
+
+def agents_meeting_threshold(outcome_counts, direction, outcome=SUCCESS_LABEL,
+                             threshold=AGENT_CALL_THRESHOLD, agents=None):
+    """
+    Number of agents with at least `threshold` calls of the given direction
+    and outcome, optionally limited to the `agents` names (e.g. one product).
+    """
+    rows = outcome_counts[(outcome_counts['Direction'] == direction)
+                          & (outcome_counts['Outcome'] == outcome)
+                          & (outcome_counts['Calls'] >= threshold)]
+    if agents is not None:
+        rows = rows[rows['Agent Name'].isin(list(agents))]
+    return rows['Agent Name'].nunique()
+
+# ============================================================================
+# STEP 4: PRESENTATION
+# ============================================================================
+
+def format_rates(df, rate_columns=None):
+    """Return a copy of df with percentage columns rendered as '12.34%' strings"""
+    if rate_columns is None:
+        rate_columns = [column for column in df.columns
+                        if column in RATE_COLUMNS or column.endswith('_Success_Rate')]
+    formatted = df.copy()
+    for column in rate_columns:
+        formatted[column] = formatted[column].map(lambda x: f"{x:.2f}%")
+    return formatted
@@ -0,0 +1,229 @@
+"""
+Call Center CDR Processing
+Vectorized column transforms used by call_center_report_copy.py:
+1. Call success classification from Status and Talk Duration
+2. Call notes normalization into a categorical 'Call Notes' column
+3. Agent name canonicalization backed by the agent_aliases.csv table
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# STEP 1: CLASSIFICATION SETTINGS
+# ============================================================================
+
+SUCCESS_LABEL = 'Successful'
+FAILURE_LABEL = 'Unsuccessful'
+
+# Statuses that are always unsuccessful, regardless of talk duration
+UNSUCCESSFUL_STATUSES = ('no answer', 'busy', 'failed', 'voicemail')
+
+# Statuses that count as successful once the talk duration threshold is met
+ANSWERED_STATUSES = ('answered',)
+
+# Minimum talk duration (seconds) for an answered call to be successful
+MIN_TALK_DURATION = 5
+
+# Strings accepted by int(): optional sign, digits (with '_' separators), padding
+_INT_LITERAL = r'\s*[+-]?\d+(?:_\d+)*\s*'
+
+# Labels used when a call has no note, keyed by lowercased status
+EMPTY_NOTE_LABELS = {
+    'no answer': 'Not picking',
+    'voicemail': 'Not picking',
+    'failed': 'Failed Connection',
+    'busy': 'Busy',
+    'answered': 'NO COMMENT WRITTEN',
+}
+UNKNOWN_NOTE_LABEL = 'UNKNOWN'
+
+# Everything from the first 'remark' (any case) onwards is dropped from a note
+_NOTE_PREFIX = re.compile(r'^(.*?)remark', flags=re.IGNORECASE | re.DOTALL)
+
+# Editable alias table: one 'Alias,Canonical Name' pair per line
+AGENT_ALIASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_aliases.csv')
+
+# Prefixes and tags stripped from 'Call From' / 'Call To' values
+_VOICEMAIL_PREFIX = r'^Voicemail\s+'
+_ANGLE_TAG = r'<.*?>'
+
+# ============================================================================
+# STEP 2: CALL SUCCESS CLASSIFICATION
+# ============================================================================
+
+def normalize_status(status):
+    """
+    Lowercase the Status column the same way str(status).lower() does,
+    working on the unique values only and mapping the result back.
+    """
+    codes, uniques = pd.factorize(status, use_na_sentinel=True)
+    lowered = np.array([str(value).lower() for value in uniques] + ['nan'], dtype=object)
+    # Missing values have code -1, which picks the trailing 'nan' entry
+    return pd.Series(lowered[codes], index=status.index)
+
+
+def talk_duration_seconds(talk_duration):
+    """
+    Convert Talk Duration to whole seconds the way int(value) would.
+    Values int() would reject (decimals in text, blanks, NaN) become NaN.
+    """
+    if pd.api.types.is_bool_dtype(talk_duration):
+        return talk_duration.astype(float)
+
+    if pd.api.types.is_numeric_dtype(talk_duration):
+        return np.trunc(talk_duration.astype(float))
+
+    kind = pd.api.types.infer_dtype(talk_duration, skipna=True)
+    if kind not in ('string', 'mixed', 'mixed-integer'):
+        return np.trunc(pd.to_numeric(talk_duration, errors='coerce').astype(float))
+
+    # Text (or mixed) column: strings must look like an integer literal,
+    # everything else is converted numerically like int() would
+    is_int_text = talk_duration.str.fullmatch(_INT_LITERAL)
+    numeric_text = talk_duration.str.replace('_', '', regex=False)
+    seconds = pd.to_numeric(numeric_text.where(is_int_text.notna(), talk_duration),
+                            errors='coerce')
+    valid = is_int_text.astype(object).fillna(True).astype(bool)
+    return np.trunc(seconds.where(valid))
+
+
+def classify_call_success(status, talk_duration,
+                          unsuccessful_statuses=UNSUCCESSFUL_STATUSES,
+                          answered_statuses=ANSWERED_STATUSES,
+                          min_talk_duration=MIN_TALK_DURATION):
+    """
+    Return a boolean Series that is True for successful calls.
+
+    A call is successful when its status is an answered status (and not an
+    unsuccessful one) and the talk duration is at least min_talk_duration.
+    """
+    status = normalize_status(status)
+    seconds = talk_duration_seconds(talk_duration)
+
+    answered = status.isin(answered_statuses) & ~status.isin(unsuccessful_statuses)
+    long_enough = (seconds >= min_talk_duration).fillna(False).astype(bool)
+    return answered & long_enough
+
+
+def determine_success_vectorized(df, **settings):
+    """
+    Build the 'Successful ?' column for the whole CDR in one pass.
+    Matches the row-by-row determine_success logic exactly.
+    """
+    successful = classify_call_success(df['Status'], df['Talk Duration'], **settings)
+    labels = np.where(successful.to_numpy(), SUCCESS_LABEL, FAILURE_LABEL)
+    return pd.Series(labels, index=df.index, dtype=object)
+
+# ============================================================================
+# STEP 3: CALL NOTES NORMALIZATION
+# ============================================================================
+
+def clean_notes_vectorized(df, empty_note_labels=EMPTY_NOTE_LABELS,
+                           unknown_label=UNKNOWN_NOTE_LABEL):
+    """
+    Build the categorical 'Call Notes' column for the whole CDR.
+
+    Notes keep only the text before the first 'remark'. Empty or NaN notes
+    are replaced by a label derived from the call status. All string work
+    runs on unique notes and statuses, then the codes are mapped back.
+    """
+    note_codes, notes = pd.factorize(df['Call Notes'], use_na_sentinel=True)
+    notes = pd.Series(notes, dtype=object).astype(str)
+
+    # Masks for empty notes and the text before 'remark' for the rest
+    empty_notes = (notes.str.strip() == '') | (notes.str.lower() == 'nan')
+    prefixes = notes.str.extract(_NOTE_PREFIX, expand=False)
+    cleaned_notes = prefixes.fillna(notes).str.strip()
+
+    # Status fallback labels, one per unique status
+    status_codes, statuses = pd.factorize(df['Status'], use_na_sentinel=True)
+    statuses = pd.Series(statuses, dtype=object).astype(str).str.lower()
+    status_labels = statuses.map(empty_note_labels).fillna(unknown_label)
+
+    # One label vocabulary: cleaned notes, then status labels, then UNKNOWN
+    # for missing statuses (code -1 picks the last entry)
+    label_values = np.concatenate([cleaned_notes.to_numpy(dtype=object),
+                                   status_labels.to_numpy(dtype=object),
+                                   np.array([unknown_label], dtype=object)])
+    label_codes, categories = pd.factorize(label_values)
+    status_label_codes = label_codes[len(notes):]
+
+    # Missing notes (code -1) pick a trailing empty-note entry
+    note_label_codes = np.append(label_codes[:len(notes)], 0)
+    empty_notes = np.append(empty_notes.to_numpy(dtype=bool), True)
+
+    use_status = empty_notes[note_codes]
+    row_codes = np.where(use_status,
+                         status_label_codes[status_codes],
+                         note_label_codes[note_codes])
+
+    call_notes = pd.Categorical.from_codes(row_codes, categories=categories)
+    return pd.Series(call_notes, index=df.index).cat.remove_unused_categories()
+
+
+def category_counts(series):
+    """value_counts() that leaves out categories with no rows in series"""
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+# ============================================================================
+# STEP 4: AGENT NAME CANONICALIZATION
+# ============================================================================
+
+def load_agent_aliases(aliases_file=AGENT_ALIASES_FILE):
+    """
+    Load the alias -> canonical agent name table.
+    Returns an empty mapping if the file does not exist.
+    """
+    if not aliases_file or not os.path.exists(aliases_file):
+        print(f"⚠️ Agent alias table not found: {aliases_file}")
+        return {}
+
+    aliases = pd.read_csv(aliases_file, dtype=str, skipinitialspace=True).dropna()
+    aliases = aliases.apply(lambda column: column.str.strip())
+    return dict(zip(aliases['Alias'], aliases['Canonical Name']))
+
+
+def clean_agent_names(names, aliases=None):
+    """
+    Strip 'Voicemail ' prefixes and <...> tags from names, then apply aliases.
+    names should hold unique values; missing values stay missing.
+    """
+    names = pd.Series(names, dtype=object)
+    present = names.notna()
+    cleaned = (names[present].astype(str)
+               .str.replace(_VOICEMAIL_PREFIX, '', regex=True)
+               .str.replace(_ANGLE_TAG, '', regex=True)
+               .str.strip())
+    if aliases:
+        cleaned = cleaned.map(lambda name: aliases.get(name, name))
+    return names.where(~present, cleaned)
+
+
+def canonicalize_agent_columns(df, columns=('Call From', 'Call To'), aliases=None):
+    """
+    Replace the given name columns with canonical, categorical names.
+
+    Values are factorized across all columns at once, so each distinct name
+    is cleaned a single time and the columns share one set of categories.
+    """
+    if aliases is None:
+        aliases = load_agent_aliases()
+
+    columns = [column for column in columns if column in df.columns]
+    stacked = np.concatenate([df[column].to_numpy(dtype=object) for column in columns])
+    codes, names = pd.factorize(stacked, use_na_sentinel=True)
+
+    # Canonical names are factorized again, since several raw spellings
+    # can collapse into one agent
+    name_codes, categories = pd.factorize(clean_agent_names(names, aliases), use_na_sentinel=True)
+    row_codes = np.where(codes == -1, -1, np.append(name_codes, -1)[codes])
+
+    for position, column in enumerate(columns):
+        column_codes = row_codes[position * len(df):(position + 1) * len(df)]
+        df[column] = pd.Categorical.from_codes(column_codes, categories=categories)
+    return df
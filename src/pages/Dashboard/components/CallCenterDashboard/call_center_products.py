@@ -0,0 +1,181 @@
+"""
+Call Center Products
+Splits the call table by product (LBF, CS, ERR, ...):
+1. The agent -> product mapping is joined onto the calls once
+2. Each product gets the row positions of its calls, so per-product
+   views are cheap takes instead of repeated isin() scans and copies
+3. The agent -> product mapping from the master workbook is cached on disk
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from call_center_loader import SNAPSHOT_DIR_NAME
+
+# ============================================================================
+# STEP 0: PRODUCT SETTINGS
+# ============================================================================
+
+MASTER_SHEET = 'Agent_Performance'
+MASTER_COLUMNS = ['Agent Name', 'Product']
+UNMAPPED_PRODUCT = 'ERR'
+
+PRODUCT_MAPPING_CACHE = 'product_mapping.json'
+
+# ============================================================================
+# STEP 1: PRODUCT JOIN
+# ============================================================================
+
+def product_codes(names, agent_products, products):
+    """
+    Return, for every value in names, the position of its agent's product
+    in products, or -1 when the value is not a known agent.
+    Categorical columns are resolved through their categories only.
+    """
+    agent_codes = products.get_indexer(agent_products.to_numpy())
+
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        positions = names.cat.categories.get_indexer(agent_products.index)
+        known = positions >= 0
+        # One slot per category plus a trailing -1 for missing names (code -1)
+        category_codes = np.full(len(names.cat.categories) + 1, -1, dtype=np.int64)
+        category_codes[positions[known]] = agent_codes[known]
+        return category_codes[names.cat.codes.to_numpy()]
+
+    positions = agent_products.index.get_indexer(names)
+    if len(agent_codes) == 0:
+        return positions
+    return np.where(positions >= 0, agent_codes[positions], -1)
+
+
+def partition_by_product(df, agent_products, columns=('Call From', 'Call To')):
+    """
+    Join agent products onto the call table in one pass and return
+    {product: row positions}; df itself is left unchanged. A call belongs to
+    every product whose agent appears in any of the columns, matching the
+    old (Call From in agents) | (Call To in agents) filters.
+    """
+    agent_products = agent_products.dropna()
+    agent_products = agent_products[~agent_products.index.duplicated(keep='last')]
+    products = pd.Index(pd.unique(agent_products.to_numpy()))
+
+    column_codes = [product_codes(df[column], agent_products, products) for column in columns]
+
+    # Encode (product, row) pairs as one integer and sort them, which groups
+    # rows by product in their original order. A call is listed under a
+    # column's product only if an earlier column did not already list it.
+    rows = len(df)
+    pairs = []
+    for position, codes in enumerate(column_codes):
+        listed = codes >= 0
+        for earlier in column_codes[:position]:
+            listed &= codes != earlier
+        pairs.append(codes[listed].astype(np.int64) * rows + np.flatnonzero(listed))
+    pairs = np.sort(np.concatenate(pairs))
+    pair_products = pairs // rows if rows else pairs
+    pair_rows = pairs % rows if rows else pairs
+
+    bounds = np.searchsorted(pair_products, np.arange(len(products) + 1))
+    return {product: pair_rows[bounds[i]:bounds[i + 1]] for i, product in enumerate(products)}
+
+
+def product_view(df, partitions, product):
+    """Return the calls of one product (empty frame if it has none)"""
+    return df.take(partitions.get(product, np.array([], dtype=np.int64)))
+
+# ============================================================================
+# STEP 2: CACHED PRODUCT MAPPING
+# ============================================================================
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_product_mapping(master_file, sheet_name=MASTER_SHEET):
+    """
+    Read the agent -> product mapping from the master workbook.
+    Only the 'Agent Name' and 'Product' columns are parsed; later rows win.
+    """
+    try:
+        master_df = pd.read_excel(master_file, sheet_name=sheet_name, usecols=MASTER_COLUMNS)
+    except ValueError as e:
+        # Sheet or columns missing: every agent will end up as ERR
+        print(f"⚠️ No agent products in {master_file}: {e}")
+        return {}
+
+    master_df = master_df.dropna().drop_duplicates(subset='Agent Name', keep='last')
+    return dict(zip(master_df['Agent Name'], master_df['Product']))
+
+
+def product_mapping_cache_path(master_file, cache_dir=None):
+    """Return the cache file location for a master workbook"""
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(master_file), SNAPSHOT_DIR_NAME)
+    return os.path.join(cache_dir, PRODUCT_MAPPING_CACHE)
+
+
+def load_product_mapping(master_file, cache_dir=None, use_cache=True):
+    """
+    Return the agent -> product mapping, reading the master workbook only
+    when its size, mtime or content differ from the cached copy.
+    """
+    cache_file = product_mapping_cache_path(master_file, cache_dir)
+    stat = os.stat(master_file)
+    source = {
+        'master_file': os.path.basename(master_file),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+    cached = None
+    if use_cache and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable product mapping cache: {e}")
+
+    # Same size and mtime: trust the cache without reading the workbook
+    if cached and all(cached.get(key) == value for key, value in source.items()):
+        return cached['mapping']
+
+    # Touched but unchanged (e.g. copied again): compare contents
+    source['sha256'] = file_sha256(master_file)
+    if cached and cached.get('sha256') == source['sha256']:
+        mapping = cached['mapping']
+    else:
+        mapping = read_product_mapping(master_file)
+
+    # Write to a temporary file first so parallel runs never read a
+    # half-written cache
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump({**source, 'mapping': mapping}, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, cache_file)
+    return mapping
+
+
+def assign_products(agents_df, product_lookup, unmapped=UNMAPPED_PRODUCT):
+    """Add a 'Product' column to agents_df; agents missing from the lookup get ERR"""
+    agents_df['Product'] = agents_df['Agent Name'].map(product_lookup).fillna(unmapped)
+    return agents_df
+
+
+def report_unmapped_agents(agents_df, unmapped=UNMAPPED_PRODUCT):
+    """Print the agents without a product so the master workbook can be fixed"""
+    names = sorted(agents_df.loc[agents_df['Product'] == unmapped, 'Agent Name'])
+    if names:
+        print(f"⚠️ {len(names)} agents have no product in the master file and were marked '{unmapped}':")
+        for name in names:
+            print(f"   - {name}")
+    return names
@@ -0,0 +1,217 @@
+"""
+Call Center Distinct-Number Sketches
+HyperLogLog sketches for the unique phone number KPIs:
+1. Each phone number is hashed to 64 bits; a sketch keeps one small
+   register per hash bucket (2 ** precision bytes in total), whatever the
+   number of calls or distinct numbers
+2. Sketches merge by taking the register maximum, so sketches of chunks,
+   files, products and days combine into the sketch of their union
+3. Sketches serialize to JSON (base64 registers) alongside the KPI files,
+   so distinct numbers can be counted across days without the call rows
+4. The relative error is about 1.04 / sqrt(2 ** precision): 0.8% at the
+   default precision of 14 (16 KB per sketch)
+Exact counting (nunique over the numbers) stays the default; set
+config['distinct_numbers'] to 'sketch' to use the sketches.
+"""
+
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# STEP 1: SKETCH SETTINGS
+# ============================================================================
+
+SKETCH_PRECISION = 14
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+
+SKETCH_FORMAT = 'hll-v1'
+
+# Column holding one register array per row of a contact sketch table
+REGISTERS_COLUMN = 'Registers'
+
+# Bundle keys of the two distinct-number KPIs and their sketches
+NUMBER_KPIS = {'called': 'distinct_called_numbers', 'calling': 'distinct_calling_numbers'}
+SKETCH_DIRECTIONS = {'called': 'Outbound', 'calling': 'Inbound'}
+
+
+def check_precision(precision):
+    """The precision as an int, if it is in the supported range"""
+    precision = int(precision)
+    if not MIN_PRECISION <= precision <= MAX_PRECISION:
+        raise ValueError(f"Sketch precision must be between {MIN_PRECISION} and {MAX_PRECISION}, got {precision}")
+    return precision
+
+# ============================================================================
+# STEP 2: HASHING AND REGISTERS
+# ============================================================================
+
+def hash_numbers(values):
+    """
+    Stable 64-bit hashes of the non-missing values. Categoricals hash each
+    category in use once; the hash key is fixed, so hashes agree across runs.
+    """
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        codes = codes[codes >= 0]
+        used = np.flatnonzero(np.bincount(codes, minlength=len(values.cat.categories)))
+        category_hashes = np.zeros(len(values.cat.categories), dtype=np.uint64)
+        category_hashes[used] = pd.util.hash_array(values.cat.categories[used].astype(str).to_numpy(dtype=object))
+        return category_hashes[codes]
+
+    values = values.dropna()
+    return pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+
+
+def bit_length(values):
+    """Number of significant bits of each uint64 value (0 for 0)"""
+    lengths = np.zeros(len(values), dtype=np.uint8)
+    remaining = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        large = remaining >= (np.uint64(1) << np.uint64(shift))
+        lengths[large] += shift
+        remaining[large] >>= np.uint64(shift)
+    return lengths + (remaining > 0)
+
+
+def register_updates(hashes, precision=SKETCH_PRECISION):
+    """
+    (bucket, rank) of each hash: the top `precision` bits pick the register,
+    the rank is the position of the first 1 bit in the remaining bits
+    """
+    remaining_bits = 64 - precision
+    buckets = (hashes >> np.uint64(remaining_bits)).astype(np.intp)
+    rest = hashes & np.uint64((1 << remaining_bits) - 1)
+    ranks = (remaining_bits + 1 - bit_length(rest)).astype(np.uint8)
+    return buckets, ranks
+
+
+def new_sketch(precision=SKETCH_PRECISION):
+    """An empty sketch: 2 ** precision zero registers"""
+    return np.zeros(1 << check_precision(precision), dtype=np.uint8)
+
+
+def sketch_values(values, precision=SKETCH_PRECISION):
+    """The sketch of a column of phone numbers"""
+    registers = new_sketch(precision)
+    buckets, ranks = register_updates(hash_numbers(values), precision)
+    np.maximum.at(registers, buckets, ranks)
+    return registers
+
+
+def merge_sketches(sketches, precision=SKETCH_PRECISION):
+    """The sketch of the union of the sketched number sets"""
+    sketches = [np.asarray(sketch, dtype=np.uint8) for sketch in sketches]
+    if not sketches:
+        return new_sketch(precision)
+    if len({len(sketch) for sketch in sketches}) > 1:
+        raise ValueError("Only sketches with the same precision can be merged")
+    return np.maximum.reduce(sketches)
+
+
+def sketch_estimate(registers):
+    """Estimated number of distinct values, with the small-range correction"""
+    registers = np.asarray(registers, dtype=np.uint8)
+    buckets = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / buckets)
+    estimate = alpha * buckets ** 2 / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+
+    empty = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * buckets and empty:
+        estimate = buckets * np.log(buckets / empty)
+    return int(round(estimate))
+
+# ============================================================================
+# STEP 3: SERIALIZATION
+# ============================================================================
+
+def sketch_to_json(registers):
+    """A JSON-ready dict of a sketch"""
+    registers = np.asarray(registers, dtype=np.uint8)
+    return {
+        'format': SKETCH_FORMAT,
+        'precision': int(len(registers)).bit_length() - 1,
+        'registers': base64.b64encode(registers.tobytes()).decode('ascii'),
+    }
+
+
+def sketch_from_json(data):
+    """The registers of a dict written by sketch_to_json()"""
+    if data.get('format') != SKETCH_FORMAT:
+        raise ValueError(f"Unknown sketch format: {data.get('format')}")
+    registers = np.frombuffer(base64.b64decode(data['registers']), dtype=np.uint8).copy()
+    if len(registers) != 1 << check_precision(data['precision']):
+        raise ValueError("Sketch registers do not match its precision")
+    return registers
+
+
+def distinct_numbers_from_files(json_files):
+    """
+    Distinct numbers called and calling in across several KPI JSON files
+    (days or products) written in sketch mode, by merging their sketches
+    """
+    sketches = {kind: [] for kind in NUMBER_KPIS}
+    for json_file in json_files:
+        with open(json_file, encoding='utf-8') as f:
+            file_sketches = json.load(f).get('number_sketches')
+        if not file_sketches:
+            raise ValueError(f"{json_file} has no number sketches (written in exact mode?)")
+        for kind in NUMBER_KPIS:
+            sketches[kind].append(sketch_from_json(file_sketches[kind]))
+
+    return {NUMBER_KPIS[kind]: sketch_estimate(merge_sketches(kind_sketches))
+            for kind, kind_sketches in sketches.items()}
+
+# ============================================================================
+# STEP 4: CONTACT SKETCH TABLES
+# ============================================================================
+
+def grouped_sketches(key_rows, values, precision=SKETCH_PRECISION):
+    """
+    One sketch of values per distinct row of key_rows, in one pass: the
+    distinct key rows (first-seen order) with a REGISTERS_COLUMN of sketches
+    """
+    precision = check_precision(precision)
+    present = pd.Series(values).notna().to_numpy()
+    key_rows, values = key_rows[present], pd.Series(values)[present]
+    keys = list(key_rows.columns)
+    groups = key_rows.groupby(keys, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+
+    registers = np.zeros((groups.max() + 1 if len(groups) else 0, 1 << precision), dtype=np.uint8)
+    buckets, ranks = register_updates(hash_numbers(values), precision)
+    np.maximum.at(registers, (groups, buckets), ranks)
+
+    # Key rows in group order
+    table = key_rows.iloc[np.unique(groups, return_index=True)[1]].reset_index(drop=True)
+    table[REGISTERS_COLUMN] = list(registers)
+    return table
+
+
+def merge_grouped_sketches(tables):
+    """Combine sketch tables of chunks, files or days by merging rows with equal keys"""
+    merged = pd.concat(tables, ignore_index=True)
+    if merged.empty:
+        return merged
+    keys = [column for column in merged.columns if column != REGISTERS_COLUMN]
+    groups = merged.groupby(keys, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+
+    # Rows sorted by group, then one register maximum per run of equal groups
+    order = np.argsort(groups, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(groups[order]) != 0])
+    stacked = np.stack(merged[REGISTERS_COLUMN].to_numpy()[order])
+    registers = np.maximum.reduceat(stacked, starts, axis=0)
+
+    result = merged[keys].iloc[order[starts]].reset_index(drop=True)
+    result[REGISTERS_COLUMN] = list(registers)
+    return result
+
+
+def direction_sketches(table, precision=SKETCH_PRECISION):
+    """{'called': outbound sketch, 'calling': inbound sketch} of a contact sketch table"""
+    direction = table['Communication Type']
+    return {kind: merge_sketches(table.loc[(direction == kind_direction).to_numpy(), REGISTERS_COLUMN], precision)
+            for kind, kind_direction in SKETCH_DIRECTIONS.items()}
@@ -0,0 +1,206 @@
+"""
+Call Center Report Stages
+Stages and report writers shared by the in-memory pipeline
+(call_center_report_copy) and the streaming one (call_center_streaming):
+1. Output folders and the report date of an export
+2. Agent products and the split of the calls by product
+3. Text, HTML, JSON, dashboard artifact and intraday heatmap files
+4. Product emails
+Neither pipeline module is imported here, so each imports this one freely.
+"""
+
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from call_center_artifacts import artifact_name, write_dashboard_artifact
+from call_center_instrumentation import instrument_stage
+from call_center_intraday import INTRADAY_SLOT_MINUTES, write_intraday_json
+from call_center_kpis import metrics_html, metrics_text, write_metrics_json
+from call_center_products import (
+    UNMAPPED_PRODUCT,
+    assign_products,
+    load_product_mapping,
+    partition_by_product,
+    product_view,
+    report_unmapped_agents,
+)
+
+# ============================================================================
+# STEP 1: OUTPUT FOLDERS AND REPORT DATE
+# ============================================================================
+
+def prepare_output_dirs(config, report_date):
+    """Create the main and per-product output folders for a report date"""
+    output_dirs = {'main': os.path.join(config['export_root'], report_date)}
+    for product in config['products']:
+        output_dirs[product] = os.path.join(config['export_root'], product, report_date)
+
+    for directory in output_dirs.values():
+        os.makedirs(directory, exist_ok=True)
+    print(f"📁 Output directory created: {output_dirs['main']}")
+    return output_dirs
+
+
+def extract_report_date(time_series):
+    """
+    Extract the report date from the Time column.
+    Accepts parsed datetimes or text in the format '11/27/2025 06:19:41 AM'
+    """
+    if len(time_series) == 0 or pd.isna(time_series.iloc[0]):
+        # Fallback to yesterday's date if no valid time data
+        return (datetime.now() - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+
+    if pd.api.types.is_datetime64_any_dtype(time_series):
+        return time_series.iloc[0].strftime("%Y-%m-%d")
+
+    first_time = str(time_series.iloc[0])
+    date_part = first_time.split(' ')[0]  # Get '11/27/2025'
+
+    # Convert to standard format
+    try:
+        date_obj = datetime.strptime(date_part, "%m/%d/%Y")
+        return date_obj.strftime("%Y-%m-%d")
+    except ValueError:
+        # Fallback if parsing fails
+        return (datetime.now() - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+
+# ============================================================================
+# STEP 2: SEPARATE AGENTS BY PRODUCT
+# ============================================================================
+
+def partition_stage(df, agents_df, config):
+    """
+    Add a 'Product' column to agents_df and split the calls by product.
+    Returns (agents_df, product_agents, product_partitions).
+    """
+    print("🏷️ Separating agents by product...")
+
+    # Load master file to get product information
+    master_cdr_file = config['master_cdr_file']
+    if master_cdr_file and os.path.exists(master_cdr_file):
+        try:
+            # Agent -> product lookup, cached until the master workbook changes
+            product_lookup = load_product_mapping(master_cdr_file)
+
+            # Map products to agents in agents_df
+            agents_df = assign_products(agents_df, product_lookup)
+
+            print(f"✅ Product mapping completed. Distribution:")
+            print(agents_df['Product'].value_counts())
+            report_unmapped_agents(agents_df)
+
+        except Exception as e:
+            print(f"⚠️ Error loading master file: {e}")
+            agents_df['Product'] = UNMAPPED_PRODUCT
+    else:
+        print("⚠️ Master CDR file not found. All agents will be marked as 'ERR'")
+        agents_df['Product'] = UNMAPPED_PRODUCT
+
+    # Separate agents by product
+    product_agents = {product: agents_df[agents_df['Product'] == product]
+                      for product in config['products']}
+    for product, product_agents_df in product_agents.items():
+        print(f"📊 {product} Agents: {len(product_agents_df)}")
+
+    # Join agent products onto the calls once; every product view below is a
+    # take of precomputed row positions instead of a full-table isin() scan
+    product_partitions = partition_by_product(df, agents_df.set_index('Agent Name')['Product'])
+
+    return agents_df, product_agents, product_partitions
+
+# ============================================================================
+# STEP 3: REPORT FILES
+# ============================================================================
+
+def write_metrics_reports(metrics, output_dir, name, report_date, style):
+    """Write the text, HTML and JSON renderings of a metrics bundle; returns the text report path"""
+    txt_report_path = os.path.join(output_dir, f"call_center_report_{name}.txt")
+    with open(txt_report_path, 'w', encoding='utf-8') as f:
+        f.write(metrics_text(metrics, report_date, style))
+
+    with open(os.path.join(output_dir, f"call_center_kpis_{name}.html"), 'w', encoding='utf-8') as f:
+        f.write(metrics_html(metrics, report_date))
+    write_metrics_json(os.path.join(output_dir, f"call_center_kpis_{name}.json"), metrics, report_date)
+    return txt_report_path
+
+
+def intraday_scopes(intraday, output_dirs, products):
+    """(scope, name suffix, profile rows, output dir) of the main and product heatmaps"""
+    scopes = [('All Products', None, intraday['profile'], output_dirs['main'])]
+    for product in products:
+        if product in intraday['partitions']:
+            scopes.append((product, product, product_view(intraday['profile'], intraday['partitions'], product),
+                           output_dirs[product]))
+    return scopes
+
+
+def scope_profile(intraday, product=None):
+    """Intraday profile rows of all products (product None) or of one product; None when turned off"""
+    if intraday is None:
+        return None
+    if product is None:
+        return intraday['profile']
+    if product not in intraday['partitions']:
+        return intraday['profile'].iloc[:0]
+    return product_view(intraday['profile'], intraday['partitions'], product)
+
+
+def write_artifact_report(metrics, agents_df, output_dir, report_date, config, intraday=None, product=None):
+    """Write the dashboard artifact of all products (product None) or one product, if turned on"""
+    if not config.get('dashboard_artifacts'):
+        return None
+    return write_dashboard_artifact(os.path.join(output_dir, artifact_name(report_date, product)), metrics,
+                                    agents_df, report_date, config['excluded_agents'],
+                                    scope_profile(intraday, product),
+                                    intraday['slot_minutes'] if intraday else INTRADAY_SLOT_MINUTES)
+
+
+def write_intraday_reports(intraday, output_dirs, report_date, products):
+    """Write the intraday heatmap matrix JSON of all products and of each product"""
+    paths = []
+    for scope, product, profile, output_dir in intraday_scopes(intraday, output_dirs, products):
+        name = '_'.join(part for part in [product, report_date] if part)
+        paths.append(write_intraday_json(os.path.join(output_dir, f"call_center_intraday_{name}.json"),
+                                         profile, report_date, scope, intraday['slot_minutes']))
+    return paths
+
+# ============================================================================
+# STEP 4: EMAIL AUTOMATION
+# ============================================================================
+
+def notify_stage(export_root, report_date, products=None):
+    """
+    Email every product report (or only the given products); returns
+    {product: True sent / False failed / None nothing to send}, or None
+    when the email automation itself failed
+    """
+    from call_center_email import integrate_email_automation
+
+    print("\n" + "="*50)
+    print("STARTING EMAIL AUTOMATION")
+    print("="*50)
+
+    # Send emails after report generation
+    try:
+        email_results = integrate_email_automation(export_root, report_date, products)
+    except Exception as e:
+        print(f"❌ Email automation failed: {e}")
+        return None
+
+    failed = [product for product, sent in email_results.items() if sent is False]
+    if failed:
+        print(f"⚠️ Emails not sent for: {', '.join(failed)}")
+    else:
+        print("✅ Email automation completed successfully!")
+    return email_results
+
+
+def notify_day(config, report_date, day_result, products=None):
+    """Run the notify stage for a report date and note its email results in day_result"""
+    with instrument_stage(config, 'notify', report_date):
+        email_results = notify_stage(config['export_root'], report_date, products)
+    day_result['email_results'] = email_results
+    day_result['emailed'] = email_results is not None and False not in email_results.values()
+    return day_result
@@ -0,0 +1,386 @@
+"""
+Call Center Streaming Aggregation
+Builds the daily reports from CDR exports too large to load at once
+(monthly or quarterly pse-cdr files):
+1. The CSV is read in chunks of a fixed number of rows
+2. Each chunk is cleaned and classified like the in-memory pipeline and
+   reduced to mergeable partial aggregates per report date: the call
+   summary (per-agent, note, status and outcome counts, see
+   call_center_kpis) and the contacts behind the distinct-number KPIs
+3. Partial aggregates merge by re-grouping, across chunks and files
+4. The merged summaries give the same metrics bundles, agent tables,
+   text/HTML/JSON reports and history rows as the in-memory path
+By default memory is bounded by the chunk size and the number of agents and
+dates, not by the size of the file: the distinct-number KPIs are estimated
+from one sketch per date, direction and agent (call_center_sketch) and the
+callback KPIs are left out of the reports (shown as n/a), since they match
+call times across the whole day.
+Two settings trade that bound for exact figures:
+- config['stream_distinct_numbers'] = 'exact' keeps every distinct
+  (caller, callee) pair, which grows with the number of customers
+- config['stream_callbacks'] = True keeps the rows callback matching reads
+  (outbound, unsuccessful inbound and dropped calls) in a narrow categorical
+  table, which grows with the number of calls
+The intraday profile (call_center_intraday) is summed chunk by chunk like
+the summary and written as the same heatmap JSON files.
+Charts and the All_Call_Data workbooks need every call row and are skipped.
+
+Usage: set config['stream_chunk_rows'] (e.g. 500_000) and call run_pipeline()
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from call_center_instrumentation import instrument_stage, new_run_id
+from call_center_intraday import PROFILE_KEYS, intraday_profile, profile_partitions
+from call_center_history import append_run_history
+from call_center_kpis import (
+    DROPPED_NOTE,
+    SUMMARY_KEYS,
+    call_summary,
+    contact_sketches,
+    metrics_bundle,
+    summary_partitions,
+)
+from call_center_loader import cdr_read_options, parse_cdr_time, peak_rss_mb, read_cdr_header
+from call_center_metrics import agent_outcome_counts, agent_performance, format_rates
+from call_center_processing import (
+    FAILURE_LABEL,
+    canonicalize_agent_columns,
+    clean_notes_vectorized,
+    determine_success_vectorized,
+    load_agent_aliases,
+)
+from call_center_products import UNMAPPED_PRODUCT, product_view
+from call_center_sketch import REGISTERS_COLUMN, merge_grouped_sketches
+from call_center_stages import (
+    extract_report_date,
+    notify_day,
+    partition_stage,
+    prepare_output_dirs,
+    write_artifact_report,
+    write_intraday_reports,
+    write_metrics_reports,
+)
+
+# ============================================================================
+# STEP 1: STREAMING SETTINGS
+# ============================================================================
+
+STREAM_CHUNK_ROWS = 500_000
+
+# Defaults that keep memory bounded by the chunk size (see the module docstring)
+STREAM_DISTINCT_NUMBERS = 'sketch'
+STREAM_CALLBACKS = False
+
+STREAM_SUMMARY_KEYS = ['Report Date'] + SUMMARY_KEYS
+STREAM_PROFILE_KEYS = ['Report Date'] + PROFILE_KEYS
+
+# The only call rows kept between chunks, and only for callback matching
+CALLBACK_COLUMNS = ['Report Date', 'Time', 'Call From', 'Call To', 'Communication Type', 'Successful ?',
+                    'Call Notes']
+
+# Distinct (caller, callee) pairs of inbound and outbound calls
+CONTACT_COLUMNS = ['Report Date', 'Communication Type', 'Call From', 'Call To']
+
+# Columns coded against one shared vocabulary (agent_key() compares their codes)
+SHARED_VOCABULARIES = {'Call From': 'names', 'Call To': 'names'}
+
+# Text columns the in-memory pipeline keeps as object rather than categorical
+OBJECT_COLUMNS = ['Successful ?']
+
+# ============================================================================
+# STEP 2: READING AND REDUCING CHUNKS
+# ============================================================================
+
+def iter_cdr_chunks(cdr_file, chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield the CDR in typed, column-pruned chunks with 'Time' parsed"""
+    usecols, dtype = cdr_read_options(read_cdr_header(cdr_file))
+    # The pyarrow engine cannot read in chunks
+    for chunk in pd.read_csv(cdr_file, engine='c', usecols=usecols, dtype=dtype, chunksize=chunk_rows):
+        chunk['Time'] = parse_cdr_time(chunk['Time'])
+        yield chunk
+
+
+def prepare_chunk(chunk, default_date, aliases):
+    """Clean, classify and date one chunk exactly like the in-memory stages"""
+    chunk = canonicalize_agent_columns(chunk, columns=['Call From', 'Call To'], aliases=aliases)
+    chunk['Call Notes'] = clean_notes_vectorized(chunk)
+    chunk['Successful ?'] = determine_success_vectorized(chunk)
+
+    # Rows without a readable time stay with the export's first date, as in
+    # call_center_loader.split_cdr_by_day
+    day_codes, days = pd.factorize(chunk['Time'].dt.normalize())
+    labels = list(days.strftime('%Y-%m-%d'))
+    missing = day_codes == -1
+    if missing.any():
+        if default_date not in labels:
+            labels.append(default_date)
+        day_codes = np.where(missing, labels.index(default_date), day_codes)
+    chunk['Report Date'] = pd.Categorical.from_codes(day_codes, categories=labels)
+    return chunk
+
+
+def callback_rows(chunk):
+    """The calls callback matching reads: outbound, unsuccessful inbound and dropped"""
+    direction = chunk['Communication Type']
+    keep = ((direction == 'Outbound')
+            | ((direction == 'Inbound') & (chunk['Successful ?'] == FAILURE_LABEL))
+            | (chunk['Call Notes'] == DROPPED_NOTE))
+    return chunk.loc[keep, CALLBACK_COLUMNS]
+
+
+def contact_rows(chunk):
+    """Distinct (date, direction, caller, callee) rows of a chunk's inbound and outbound calls"""
+    directional = chunk['Communication Type'].isin(['Inbound', 'Outbound'])
+    return chunk.loc[directional, CONTACT_COLUMNS].drop_duplicates(ignore_index=True)
+
+# ============================================================================
+# STEP 3: MERGING PARTIAL AGGREGATES
+# ============================================================================
+
+def encode_columns(frame, vocabularies):
+    """
+    frame with its text and categorical columns replaced by int32 codes into
+    vocabularies (name -> code) shared by every chunk. Partial aggregates then
+    concatenate and re-group as plain integers, without unioning categories.
+    """
+    encoded = {}
+    for column in frame.columns:
+        values = frame[column]
+        if (column == REGISTERS_COLUMN or pd.api.types.is_numeric_dtype(values)
+                or pd.api.types.is_datetime64_any_dtype(values)):
+            encoded[column] = values.to_numpy()
+            continue
+
+        values = values.astype('category')
+        vocabulary = vocabularies.setdefault(SHARED_VOCABULARIES.get(column, column), {})
+        codes = values.cat.codes.to_numpy()
+        # Only the categories in use are looked up; new names get the next code
+        used = np.flatnonzero(np.bincount(codes[codes >= 0], minlength=len(values.cat.categories)))
+        lookup = np.full(len(values.cat.categories) + 1, -1, dtype=np.int32)
+        lookup[used] = np.fromiter((vocabulary.setdefault(name, len(vocabulary))
+                                    for name in values.cat.categories[used]), dtype=np.int32, count=len(used))
+        encoded[column] = lookup[codes]
+    return pd.DataFrame(encoded)
+
+
+def decode_columns(encoded, vocabularies):
+    """Turn the codes of encode_columns() back into categorical (or object) columns"""
+    decoded = {}
+    for column in encoded.columns:
+        name = SHARED_VOCABULARIES.get(column, column)
+        if name not in vocabularies:
+            decoded[column] = encoded[column].to_numpy()
+            continue
+
+        values = pd.Categorical.from_codes(encoded[column].to_numpy(),
+                                           categories=pd.Index(list(vocabularies[name]), dtype=object))
+        decoded[column] = values.to_numpy(dtype=object, na_value=np.nan) if column in OBJECT_COLUMNS else values
+    return pd.DataFrame(decoded)
+
+
+def merge_summaries(summaries, keys=STREAM_SUMMARY_KEYS):
+    """Combine encoded call summaries (or intraday profiles) of chunks, files or days by re-grouping"""
+    merged = pd.concat(summaries, ignore_index=True)
+    merged = merged.groupby(keys, dropna=False, sort=False)['Calls'].sum()
+    return merged.reset_index()
+
+
+def merge_contacts(contacts):
+    """Combine encoded (caller, callee) pair sets of chunks, files or days"""
+    return pd.concat(contacts, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+def stream_cdr(cdr_files, chunk_rows=STREAM_CHUNK_ROWS, keep_callbacks=STREAM_CALLBACKS, sketch_precision=None,
+               slot_minutes=None):
+    """
+    Read the CDR files chunk by chunk and return the merged aggregates:
+    {'rows', 'chunks', 'default_date', 'summary', 'contacts', 'callback_calls', 'profile', 'peak_rss_mb'}
+    With sketch_precision set, 'contacts' is a contact sketch table rather
+    than the (caller, callee) pair set; 'profile' is the intraday profile
+    with slot_minutes slots (None when slot_minutes is not set).
+    """
+    aliases = load_agent_aliases()
+    vocabularies = {}
+    summary, contacts, profile, callback_chunks = None, None, None, []
+    rows, chunks, default_date = 0, 0, None
+
+    for cdr_file in cdr_files:
+        for chunk in iter_cdr_chunks(cdr_file, chunk_rows):
+            if default_date is None:
+                default_date = extract_report_date(chunk['Time'])
+            chunk = prepare_chunk(chunk, default_date, aliases)
+
+            chunk_summary = encode_columns(call_summary(chunk, STREAM_SUMMARY_KEYS), vocabularies)
+            summary = chunk_summary if summary is None else merge_summaries([summary, chunk_summary])
+            if sketch_precision:
+                chunk_contacts = encode_columns(contact_sketches(chunk, CONTACT_COLUMNS, sketch_precision),
+                                                vocabularies)
+                contacts = chunk_contacts if contacts is None else merge_grouped_sketches([contacts, chunk_contacts])
+            else:
+                chunk_contacts = encode_columns(contact_rows(chunk), vocabularies)
+                contacts = chunk_contacts if contacts is None else merge_contacts([contacts, chunk_contacts])
+            if slot_minutes:
+                chunk_profile = encode_columns(intraday_profile(chunk, slot_minutes, extra_keys=['Report Date']),
+                                               vocabularies)
+                profile = chunk_profile if profile is None else merge_summaries([profile, chunk_profile],
+                                                                                STREAM_PROFILE_KEYS)
+            if keep_callbacks:
+                callback_chunks.append(encode_columns(callback_rows(chunk), vocabularies))
+
+            rows += len(chunk)
+            chunks += 1
+            print(f"✓ Chunk {chunks}: {rows:,} calls read, {len(summary):,} summary rows, "
+                  f"{len(contacts):,} contacts, peak RSS {peak_rss_mb()} MB")
+
+    if summary is None:
+        raise ValueError(f"No calls found in {', '.join(cdr_files)}")
+
+    if callback_chunks:
+        callback_calls = decode_columns(pd.concat(callback_chunks, ignore_index=True), vocabularies)
+    else:
+        callback_calls = pd.DataFrame({column: pd.Series(dtype='datetime64[ns]' if column == 'Time' else object)
+                                       for column in CALLBACK_COLUMNS})
+    return {
+        'rows': rows,
+        'chunks': chunks,
+        'default_date': default_date,
+        'summary': decode_columns(summary, vocabularies),
+        'contacts': decode_columns(contacts, vocabularies),
+        'callback_calls': callback_calls,
+        'profile': None if profile is None else decode_columns(profile, vocabularies),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def split_by_report_date(frame):
+    """{report_date: that date's rows} in date order"""
+    days = {str(report_date): rows.reset_index(drop=True)
+            for report_date, rows in frame.groupby('Report Date', observed=True, sort=False)}
+    return dict(sorted(days.items()))
+
+# ============================================================================
+# STEP 4: DAILY REPORTS
+# ============================================================================
+
+def aggregate_day(summary, contacts, callback_calls, config):
+    """The aggregate stage on a day's merged aggregates: (call_metrics, agents_df, agent_outcomes)"""
+    excluded_agents = config['excluded_agents']
+    agents_df = agent_performance(summary, excluded_agents=excluded_agents + config['performance_excluded_agents'],
+                                  count_column='Calls')
+    agent_outcomes = agent_outcome_counts(summary, excluded_agents=excluded_agents, count_column='Calls')
+    call_metrics = metrics_bundle(summary, callback_calls if config['stream_callbacks'] else None, agents_df,
+                                  agent_outcomes, 'All Products', config, contacts=contacts)
+    return call_metrics, agents_df, agent_outcomes
+
+
+def export_day(call_metrics, agents_df, agent_outcomes, product_agents, contacts, callback_calls,
+               callback_partitions, output_dirs, report_date, config, intraday=None):
+    """Write the text/HTML/JSON reports and agent workbooks of a streamed day; returns the workbook paths"""
+    from call_center_excel import iter_excel_rows, write_workbooks
+
+    with instrument_stage(config, 'text_reports', report_date, rows=len(call_metrics['summary'])):
+        summary = call_metrics['summary']
+        summary_parts = summary_partitions(summary, agents_df)
+        contact_parts = summary_partitions(contacts, agents_df)
+
+        workbook_jobs = []
+        for product, product_agents_df in product_agents.items():
+            if len(product_agents_df) == 0:
+                print(f"⚠️ No agents found for {product}, skipping report generation")
+                continue
+            product_calls = None
+            if config['stream_callbacks']:
+                product_calls = product_view(callback_calls, callback_partitions, product)
+            metrics = metrics_bundle(product_view(summary, summary_parts, product), product_calls,
+                                     product_agents_df, agent_outcomes, product, config,
+                                     agents=product_agents_df['Agent Name'],
+                                     contacts=product_view(contacts, contact_parts, product))
+            write_metrics_reports(metrics, output_dirs[product], f"{product}_{report_date}", report_date, 'product')
+            write_artifact_report(metrics, product_agents_df, output_dirs[product], report_date, config, intraday,
+                                  product)
+
+            agent_excel_path = os.path.join(output_dirs[product], f"AGENT_PERFORMANCE_{product}_{report_date}.xlsx")
+            workbook_jobs.append((agent_excel_path, {'Sheet1': list(iter_excel_rows(format_rates(product_agents_df)))}))
+
+        write_metrics_reports(call_metrics, output_dirs['main'], report_date, report_date, 'main')
+        write_artifact_report(call_metrics, agents_df, output_dirs['main'], report_date, config, intraday)
+
+        if intraday is not None:
+            write_intraday_reports(intraday, output_dirs, report_date, product_agents)
+
+    with instrument_stage(config, 'excel', report_date, rows=len(agents_df)):
+        excel_paths = write_workbooks(workbook_jobs, workers=config['excel_workers'], spawn_safe=True)
+
+    if config['write_history']:
+        with instrument_stage(config, 'history', report_date, rows=len(agents_df)):
+            append_run_history(config['export_root'], report_date, agents_df, summary, summary_parts,
+                               count_column='Calls')
+    return excel_paths
+
+
+def run_streaming_pipeline(config, export=True, notify=True):
+    """
+    The run_pipeline() of streaming mode: aggregate config['cdr_file'] in
+    chunks of config['stream_chunk_rows'] rows, then report every day
+    """
+    # The streaming settings stand in for the in-memory ones in the KPIs
+    config = {**config, 'run_id': config.get('run_id') or new_run_id(),
+              'distinct_numbers': config.get('stream_distinct_numbers', STREAM_DISTINCT_NUMBERS),
+              'stream_callbacks': config.get('stream_callbacks', STREAM_CALLBACKS)}
+    cdr_files = config['cdr_file'] if isinstance(config['cdr_file'], (list, tuple)) else [config['cdr_file']]
+    chunk_rows = config.get('stream_chunk_rows') or STREAM_CHUNK_ROWS
+
+    print(f"📊 Streaming call data in chunks of {chunk_rows:,} rows...")
+    with instrument_stage(config, 'stream') as stage:
+        sketch_precision = config['sketch_precision'] if config['distinct_numbers'] == 'sketch' else None
+        aggregates = stream_cdr(cdr_files, chunk_rows, config['stream_callbacks'], sketch_precision,
+                                config.get('intraday_slot_minutes'))
+        stage['rows'] = aggregates['rows']
+
+    day_summaries = split_by_report_date(aggregates['summary'])
+    day_contacts = split_by_report_date(aggregates['contacts'])
+    day_calls = split_by_report_date(aggregates['callback_calls'])
+    day_profiles = None if aggregates['profile'] is None else split_by_report_date(aggregates['profile'])
+    print(f"📅 Export covers {len(day_summaries)} days: {', '.join(day_summaries)}")
+
+    result = {'run_id': config['run_id'], 'rows': aggregates['rows'], 'days': {}}
+    for report_date, summary in day_summaries.items():
+        contacts = day_contacts.get(report_date, aggregates['contacts'].iloc[:0])
+        callback_calls = day_calls.get(report_date, aggregates['callback_calls'].iloc[:0])
+        print(f"\n📅 Reporting {report_date}")
+
+        with instrument_stage(config, 'aggregate', report_date, rows=len(summary)):
+            call_metrics, agents_df, agent_outcomes = aggregate_day(summary, contacts, callback_calls, config)
+        with instrument_stage(config, 'partition', report_date, rows=len(callback_calls)):
+            agents_df, product_agents, callback_partitions = partition_stage(callback_calls, agents_df, config)
+
+        intraday = None
+        if day_profiles is not None:
+            with instrument_stage(config, 'intraday', report_date):
+                profile = day_profiles.get(report_date, aggregates['profile'].iloc[:0])
+                profile = profile[~profile['Agent Name'].isin(config['excluded_agents'])].reset_index(drop=True)
+                intraday = {'profile': profile, 'partitions': profile_partitions(profile, agents_df),
+                            'slot_minutes': config['intraday_slot_minutes']}
+
+        day_result = {'report_date': report_date, 'call_metrics': call_metrics, 'agents_df': agents_df,
+                      'agent_outcomes': agent_outcomes, 'product_agents': product_agents}
+        if export:
+            output_dirs = prepare_output_dirs(config, report_date)
+            day_result['output_dirs'] = output_dirs
+            day_result['excel_paths'] = export_day(call_metrics, agents_df, agent_outcomes, product_agents,
+                                                   contacts, callback_calls, callback_partitions, output_dirs,
+                                                   report_date, config, intraday)
+            print(f"✅ Streamed report for {report_date} written to {output_dirs['main']}")
+            for product, product_agents_df in product_agents.items():
+                if product != UNMAPPED_PRODUCT or len(product_agents_df) > 0:
+                    print(f"   - {product}: {output_dirs[product]}")
+
+        if notify:
+            notify_day(config, report_date, day_result)
+        result['days'][report_date] = day_result
+
+    return result
@@ -0,0 +1,185 @@
+"""
+Call Center Synthetic Data
+Generates realistic test inputs for the call center pipeline:
+1. pse-cdr shaped CSV exports with every column of the real file
+2. A matching master_cdr_call workbook mapping agents to products
+Agents, products, row counts, days, status mix and notes vocabulary are all
+configurable, and the same seed always gives the same files.
+
+Usage: python call_center_synthetic.py OUTPUT_DIR [--rows N] [--agents N]
+                                       [--products LBF,CS] [--days N] [--seed N]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from call_center_loader import CDR_TIME_FORMAT, DROPPED_CDR_COLUMNS
+from call_center_products import MASTER_SHEET
+
+# ============================================================================
+# STEP 1: GENERATOR SETTINGS
+# ============================================================================
+
+STATUS_MIX = {
+    'Answered': 0.55,
+    'No Answer': 0.25,
+    'Busy': 0.08,
+    'Failed': 0.07,
+    'Voicemail': 0.05,
+}
+
+NOTES_VOCABULARY = [
+    'Dead Air',
+    'Promise to pay',
+    'Customer will visit branch Remark: follow up',
+    'Interested in top up',
+    'Wrong number',
+    'Already paid remark receipt sent',
+]
+
+# Share of answered calls where the agent left the note empty
+EMPTY_NOTE_SHARE = 0.3
+
+# Direction mix; internal calls go from one agent to another
+DIRECTION_MIX = {'Outbound': 0.6, 'Inbound': 0.35, 'Internal': 0.05}
+
+PRODUCTS = ['LBF', 'CS']
+AGENT_COUNT = 200
+
+# Agents left out of the master workbook, so the report marks them ERR
+UNMAPPED_AGENT_SHARE = 0.05
+
+# Customers per call; a smaller pool means more repeat calls and callbacks
+CUSTOMERS_PER_CALL = 0.3
+
+START_DATE = '2025-11-27'
+
+# ============================================================================
+# STEP 2: CDR ROWS
+# ============================================================================
+
+def agent_names(agent_count=AGENT_COUNT):
+    """Agent names used in both the CDR and the master workbook"""
+    return np.array([f"Agent {i:03d}" for i in range(agent_count)], dtype=object)
+
+
+def make_synthetic_cdr(rows, seed=0, status_mix=STATUS_MIX, notes_vocabulary=NOTES_VOCABULARY,
+                       empty_note_share=EMPTY_NOTE_SHARE):
+    """Build a CDR-shaped DataFrame with the columns the classifier reads"""
+    rng = np.random.default_rng(seed)
+    statuses = rng.choice(list(status_mix), size=rows, p=list(status_mix.values()))
+    talk_duration = rng.integers(0, 600, size=rows)
+    talk_duration[statuses != 'Answered'] = 0
+
+    notes = rng.choice(notes_vocabulary, size=rows).astype(object)
+    no_note = (statuses != 'Answered') | (rng.random(rows) < empty_note_share)
+    notes[no_note] = np.nan
+
+    return pd.DataFrame({
+        'Status': statuses,
+        'Talk Duration': talk_duration,
+        'Call Notes': notes,
+    })
+
+
+def make_synthetic_cdr_export(rows, seed=0, agent_count=AGENT_COUNT, days=1, start_date=START_DATE,
+                              direction_mix=DIRECTION_MIX, **cdr_options):
+    """
+    Build a DataFrame with every column of a real pse-cdr export.
+    Calls are spread over `days` calendar days from start_date, in time order.
+    Extra options (status_mix, notes_vocabulary, ...) go to make_synthetic_cdr().
+    """
+    rng = np.random.default_rng(seed)
+    df = make_synthetic_cdr(rows, seed, **cdr_options)
+    agents = agent_names(agent_count)
+    customers = np.char.add('2557', rng.integers(10 ** 7, 10 ** 8, size=max(1, int(rows * CUSTOMERS_PER_CALL)))
+                            .astype(str)).astype(object)
+
+    directions = rng.choice(list(direction_mix), size=rows, p=list(direction_mix.values()))
+    agent = rng.choice(agents, size=rows)
+    other = np.where(directions == 'Internal', rng.choice(agents, size=rows), rng.choice(customers, size=rows))
+    outbound = directions != 'Inbound'
+    seconds = np.sort(rng.integers(0, days * 24 * 3600, size=rows))
+
+    export = pd.DataFrame({
+        'Time': (pd.Timestamp(start_date) + pd.to_timedelta(seconds, unit='s')).strftime(CDR_TIME_FORMAT),
+        'Call From': np.where(outbound, agent, other),
+        'Call To': np.where(outbound, other, agent),
+        'Communication Type': directions,
+        'Status': df['Status'],
+        'Talk Duration': df['Talk Duration'],
+        'Ring Duration': rng.integers(0, 40, size=rows),
+        'Call Notes': df['Call Notes'],
+    })
+    for column in DROPPED_CDR_COLUMNS:
+        export[column] = 'x' * 24
+    return export
+
+
+def write_synthetic_cdr_csv(path, rows, seed=0, **export_options):
+    """Write a pse-cdr shaped CSV export with every column of the real file"""
+    make_synthetic_cdr_export(rows, seed, **export_options).to_csv(path, index=False)
+    return path
+
+# ============================================================================
+# STEP 3: MASTER WORKBOOK
+# ============================================================================
+
+def make_agent_products(agent_count=AGENT_COUNT, products=PRODUCTS, unmapped_share=UNMAPPED_AGENT_SHARE, seed=0):
+    """Agent -> product table for the master workbook; a few agents are left out"""
+    rng = np.random.default_rng(seed)
+    agents = agent_names(agent_count)
+    mapped = rng.random(agent_count) >= unmapped_share
+    return pd.DataFrame({
+        'Agent Name': agents[mapped],
+        'Product': rng.choice(products, size=agent_count)[mapped],
+    })
+
+
+def write_master_workbook(path, agent_count=AGENT_COUNT, products=PRODUCTS,
+                          unmapped_share=UNMAPPED_AGENT_SHARE, seed=0):
+    """Write a master_cdr_call workbook with the agent -> product sheet"""
+    agent_products = make_agent_products(agent_count, products, unmapped_share, seed)
+    agent_products.to_excel(path, sheet_name=MASTER_SHEET, index=False)
+    return path
+
+
+def write_synthetic_inputs(folder, rows, seed=0, agent_count=AGENT_COUNT, products=PRODUCTS,
+                           **export_options):
+    """
+    Write a pse-cdr CSV and a master workbook into folder, named the way the
+    report looks for them. Returns (cdr_file, master_cdr_file).
+    """
+    os.makedirs(folder, exist_ok=True)
+    cdr_file = write_synthetic_cdr_csv(os.path.join(folder, f"pse-cdr-synthetic-{rows}.csv"), rows, seed,
+                                       agent_count=agent_count, **export_options)
+    master_file = write_master_workbook(os.path.join(folder, "master_cdr_call_synthetic.xlsx"),
+                                        agent_count, products, seed=seed)
+    return cdr_file, master_file
+
+# ============================================================================
+# STEP 4: ENTRY POINT
+# ============================================================================
+
+def main():
+    """Parse the command line and write one synthetic input folder"""
+    parser = argparse.ArgumentParser(description="Write synthetic call center inputs")
+    parser.add_argument('folder', help="output folder (used as ROW_FILES)")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--agents', type=int, default=AGENT_COUNT)
+    parser.add_argument('--products', default=','.join(PRODUCTS), help="comma separated product names")
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cdr_file, master_file = write_synthetic_inputs(args.folder, args.rows, args.seed, args.agents,
+                                                   args.products.split(','), days=args.days)
+    print(f"✓ CDR export: {cdr_file}")
+    print(f"✓ Master workbook: {master_file}")
+
+
+if __name__ == "__main__":
+    main()
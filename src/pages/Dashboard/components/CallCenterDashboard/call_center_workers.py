@@ -0,0 +1,39 @@
+"""
+Call Center Worker Pools
+The process pools the chart and Excel stages run their work in:
+1. 'fork' where the platform has it, so workers inherit the parent's memory
+2. 'spawn' (Windows) only when the calling script is spawn safe, i.e. keeps
+   its work under `if __name__ == "__main__"`
+3. Otherwise, or for a single item, the work runs in this process
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def pool_context(spawn_safe=False):
+    """The multiprocessing context to start workers with, or None to work in this process"""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    if spawn_safe:
+        return multiprocessing.get_context('spawn')
+    return None
+
+
+def is_forked(context):
+    """True when workers of context inherit the parent's memory"""
+    return context is not None and context.get_start_method() == 'fork'
+
+
+def map_in_pool(function, items, workers=None, spawn_safe=False):
+    """function applied to every item, in a process pool when one can be used; results keep item order"""
+    items = list(items)
+    workers = min(workers or os.cpu_count() or 1, len(items))
+    context = pool_context(spawn_safe)
+
+    if workers <= 1 or context is None:
+        return [function(item) for item in items]
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        return list(executor.map(function, items))
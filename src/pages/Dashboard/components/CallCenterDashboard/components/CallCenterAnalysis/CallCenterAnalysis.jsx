@@ -9,9 +9,10 @@ const CallCenterAnalysis = ({ parsedData, department }) => {
   const allCallData = parsedData.allCallData || [];
   const agentPerformance = parsedData.agentPerformance || [];
   
-  const metrics = calculateMetrics(allCallData);
-  const callNotesDist = getCallNotesDistribution(allCallData);
-  const statusDist = getStatusDistribution(allCallData);
+  // Pre-aggregated reports carry these directly; workbooks are counted here
+  const metrics = parsedData.metrics || calculateMetrics(allCallData);
+  const callNotesDist = parsedData.callNotesDistribution || getCallNotesDistribution(allCallData);
+  const statusDist = parsedData.statusDistribution || getStatusDistribution(allCallData);
   const topAgents = getTopAgents(agentPerformance, 10);
 
   // Prepare chart data
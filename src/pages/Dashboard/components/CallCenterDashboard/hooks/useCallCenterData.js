@@ -4,8 +4,61 @@ import { db } from '../../../../../services/firebase';
 import { getReportFileUrl } from '../../../../../services/supabase';
 import * as XLSX from 'xlsx';
 
+// Pre-aggregated dashboard files written by call_center_artifacts.py next to
+// each FINAL_CDR_CALL_REPORT workbook; a few KB instead of the full workbook
+const ARTIFACT_PREFIX = 'CALL_CENTER_DASHBOARD';
+const SUPPORTED_ARTIFACT_VERSIONS = [1];
+
+const sameDay = (a, b) => {
+  const dateA = a instanceof Date ? a : new Date(a);
+  const dateB = b instanceof Date ? b : new Date(b);
+  return dateA.toDateString() === dateB.toDateString();
+};
+
+// Expand a column-wise { columns, rows } table into sheet_to_json-style records
+const tableRecords = (table) => {
+  if (!table) return null;
+  return table.rows.map(row => Object.fromEntries(table.columns.map((column, i) => [column, row[i]])));
+};
+
+// Build parsedData from an artifact; returns null for unknown schema versions
+const parseArtifact = (artifact, report) => {
+  if (!SUPPORTED_ARTIFACT_VERSIONS.includes(artifact.schema_version)) {
+    return null;
+  }
+
+  const tables = artifact.tables || {};
+  const metrics = artifact.metrics || {};
+  return {
+    reportDate: report.date,
+    fileName: report.fileName || report.title,
+    schemaVersion: artifact.schema_version,
+    allCallData: null,
+    agentPerformance: tableRecords(tables.Agent_Performance),
+    outboundSummary: tableRecords(tables.Outbound_Summary),
+    inboundSummary: tableRecords(tables.Inbound_Summary),
+    callNotesSummary: tableRecords(tables.Call_Notes_Summary),
+    // Same shape as calculateMetrics() and the distribution helpers
+    metrics: {
+      totalCalls: metrics.total_calls || 0,
+      inboundCalls: metrics.inbound_calls || 0,
+      outboundCalls: metrics.outbound_calls || 0,
+      internalCalls: metrics.internal_calls || 0,
+      successfulCalls: metrics.successful_calls || 0,
+      unsuccessfulCalls: metrics.unsuccessful_calls || 0,
+      distinctCalledNumbers: metrics.distinct_called_numbers || 0,
+      distinctCallingNumbers: metrics.distinct_calling_numbers || 0,
+      communicationTypeCounts: artifact.communication_counts || {}
+    },
+    callNotesDistribution: artifact.note_counts || {},
+    statusDistribution: artifact.status_counts || {},
+    intradayProfile: artifact.intraday || null
+  };
+};
+
 export const useCallCenterData = (department, selectedDate = null) => {
   const [reports, setReports] = useState([]);
+  const [artifacts, setArtifacts] = useState([]);
   const [parsedData, setParsedData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -20,7 +73,7 @@ export const useCallCenterData = (department, selectedDate = null) => {
     } else {
       setParsedData(null);
     }
-  }, [reports, selectedDate]);
+  }, [reports, artifacts, selectedDate]);
 
   const fetchCallCenterReports = async () => {
     try {
@@ -54,13 +107,15 @@ export const useCallCenterData = (department, selectedDate = null) => {
       }
 
       const reportsData = [];
+      const artifactsData = [];
 
       for (const doc of snapshot.docs) {
         const data = doc.data();
         const fileName = data.fileName || data.title || 'Unknown';
+        const isArtifact = fileName.includes(ARTIFACT_PREFIX) && fileName.endsWith('.json');
         
         // Check if file name contains FINAL_CDR_CALL_REPORT
-        if (fileName.includes('FINAL_CDR_CALL_REPORT')) {
+        if (fileName.includes('FINAL_CDR_CALL_REPORT') || isArtifact) {
           let fileUrl = data.fileUrl;
           
           if (!fileUrl && data.filePath) {
@@ -73,7 +128,7 @@ export const useCallCenterData = (department, selectedDate = null) => {
           }
 
           if (fileUrl) {
-            reportsData.push({
+            (isArtifact ? artifactsData : reportsData).push({
               id: doc.id,
               ...data,
               fileUrl,
@@ -90,6 +145,7 @@ export const useCallCenterData = (department, selectedDate = null) => {
         return dateB - dateA;
       });
 
+      setArtifacts(artifactsData);
       setReports(reportsData);
     } catch (err) {
       console.error('Error fetching call center reports:', err);
@@ -112,16 +168,32 @@ export const useCallCenterData = (department, selectedDate = null) => {
       // Use selected date report or most recent report
       let targetReport = reports[0];
       if (selectedDate) {
-        const selected = reports.find(r => {
-          const reportDate = r.date instanceof Date ? r.date : new Date(r.date);
-          const selectDate = selectedDate instanceof Date ? selectedDate : new Date(selectedDate);
-          return reportDate.toDateString() === selectDate.toDateString();
-        });
+        const selected = reports.find(r => sameDay(r.date, selectedDate));
         if (selected) {
           targetReport = selected;
         }
       }
       const latestReport = targetReport;
+
+      // Prefer the day's pre-aggregated artifact; fall back to the workbook
+      // when there is none, it fails to load or its schema is unknown
+      const artifact = artifacts.find(a => sameDay(a.date, latestReport.date));
+      if (artifact) {
+        try {
+          const artifactResponse = await fetch(artifact.fileUrl);
+          if (!artifactResponse.ok) {
+            throw new Error(`Failed to fetch artifact: ${artifactResponse.statusText}`);
+          }
+          const fromArtifact = parseArtifact(await artifactResponse.json(), latestReport);
+          if (fromArtifact) {
+            setParsedData(fromArtifact);
+            return;
+          }
+          console.warn(`Unsupported dashboard artifact version in ${artifact.fileName}, parsing the workbook`);
+        } catch (artifactError) {
+          console.warn('Could not load dashboard artifact, parsing the workbook:', artifactError);
+        }
+      }
       
       if (!latestReport.fileUrl) {
         setError('No file URL available for parsing');